@@ -1,19 +1,49 @@
 # app.py
-from fastapi import FastAPI
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import numpy as np
+from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 
-from models import AnalysisRequest
+from models import AnalysisRequest, BatchAnalysisRequest, YearsToTargetBatchRequest
 from constants import (
     ALLOCATION_RULES,
-    ASSET_PROFILES,
+    BATCH_GROUPS_PER_JOB,
+    BATCH_MAX_ALLOCATIONS,
     DEFAULT_MAX_YEARS,
     DEFAULT_MONTE_CARLO_SIMS,
-    DISCLAIMER_TEXT
+    DISCLAIMER_TEXT,
+    INDUSTRY_INDEX_ASSETS,
+    POOL_QUEUE,
+    POOL_TIMEOUT,
+    POOL_WORKERS
+)
+
+from market_data import all_asset_profiles, industry_model
+from simulation import (
+    run_monte_carlo,
+    run_monte_carlo_batch,
+    years_to_reach_real_target,
+    years_to_reach_real_target_batch
 )
+from scenarios import run_monte_carlo_batch_shared, run_monte_carlo_shared, store as scenario_store
+from workers import SimulationPool, run_calls
+
+# Monte Carlo runs in worker processes so the event loop stays free
+pool = SimulationPool(POOL_WORKERS, POOL_QUEUE, POOL_TIMEOUT)
 
-from simulation import run_monte_carlo, years_to_reach_real_target
 
-app = FastAPI(title="Portfolio Simulation v2.2 (Educational Demo)")
+@asynccontextmanager
+async def lifespan(app):
+    # generate/map the shared scenario paths before the first request
+    await asyncio.to_thread(scenario_store.warm, DEFAULT_MAX_YEARS, DEFAULT_MONTE_CARLO_SIMS)
+    yield
+    pool.shutdown()
+
+
+app = FastAPI(title="Portfolio Simulation v2.2 (Educational Demo)", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -27,18 +57,35 @@ def get_disclaimer():
     return {"disclaimer": DISCLAIMER_TEXT}
 
 
-@app.post("/portfolio/analysis")
-def analysis(req: AnalysisRequest):
+@app.get("/portfolio/assets")
+def get_assets():
+    # representative assets plus the SET industry indexes estimated from history
+    profiles = all_asset_profiles()
+    industry_profiles, corr, last_date = industry_model()
+    keys = list(industry_profiles.keys())
+    return {
+        "assets": profiles,
+        "industry_correlation": {
+            a: {b: round(float(corr[i, j]), 4) for j, b in enumerate(keys)}
+            for i, a in enumerate(keys)
+        },
+        "industry_data_last_date": last_date
+    }
+
+
+def plan_profile(req: AnalysisRequest, profiles: dict):
+    """Budget, emergency fund, readiness and allocation for one request.
+
+    Everything ``analysis`` works out before simulating; shared with the
+    batch endpoint so both report the same numbers.
+    """
     profile = req.profile
 
     income = profile.monthly_income
     expense = profile.monthly_expense
     declared_contribution = profile.monthly_contribution
     savings = profile.current_savings
-    inflation = profile.inflation_rate
     emergency_amount = profile.emergency_fund_amount
-    sims = DEFAULT_MONTE_CARLO_SIMS
-    max_years = DEFAULT_MAX_YEARS
 
     # ======== 1) Calculate spare cash ========
     spare_cash = income - expense
@@ -79,57 +126,241 @@ def analysis(req: AnalysisRequest):
         readiness_notes.append(budget_note)
 
     # ======== 4) Portfolio allocation ========
-    rb = profile.risk_bucket.lower() if profile.risk_bucket else "moderate"
-    if rb not in ALLOCATION_RULES:
-        rb = "moderate"
+    if req.allocation:
+        unknown = sorted(set(req.allocation) - set(profiles))
+        if unknown:
+            raise HTTPException(status_code=422, detail=f"Unknown assets: {', '.join(unknown)}")
+        rb = "custom"
+        allocation = req.allocation
+    else:
+        rb = profile.risk_bucket.lower() if profile.risk_bucket else "moderate"
+        if rb not in ALLOCATION_RULES:
+            rb = "moderate"
+        allocation = ALLOCATION_RULES[rb]
 
-    allocation = ALLOCATION_RULES[rb]
+    # deterministic expected annual return
+    est_return = sum(profiles[a]["mean"] * pct for a, pct in allocation.items())
 
-    annual_contribution = actual_contribution * 12
+    summary = {
+        "monthly_income": income,
+        "monthly_expense": expense,
+        "monthly_contribution_declared": declared_contribution,
+        "monthly_contribution_used": actual_contribution,
+        "spare_cash": spare_cash,
+        "current_savings": savings,
+        "emergency_fund_required": emergency_amount,
+        "investable_savings": investable,
+        "emergency_shortfall": shortfall,
+        "readiness": readiness,
+        "readiness_notes": readiness_notes
+    }
+    return {
+        "profile_summary": summary,
+        "risk_bucket": rb,
+        "allocation": allocation,
+        "investable": investable,
+        "annual_contribution": actual_contribution * 12,
+        "estimated_annual_return": est_return
+    }
 
-    # deterministic expected annual return
-    est_return = sum(ASSET_PROFILES[a]["mean"] * pct for a, pct in allocation.items())
 
-    # ======== 5) Monte Carlo Simulation ========
-    mc = run_monte_carlo(
-        allocation=allocation,
-        investable_balance=investable,
-        annual_contribution=annual_contribution,
-        years=max_years,
-        simulations=sims
-    )
+def check_return_model(return_model: str, allocation: dict):
+    # bootstrap only resamples the SET_* history; without those assets it
+    # would quietly run the Gaussian model
+    if return_model == "bootstrap" and not any(a in INDUSTRY_INDEX_ASSETS for a in allocation):
+        raise HTTPException(
+            status_code=422,
+            detail="return_model 'bootstrap' needs SET_* assets in the allocation "
+                   f"({', '.join(INDUSTRY_INDEX_ASSETS)})"
+        )
 
+
+def portfolio_result(req: AnalysisRequest, plan: dict, mc: dict, sims: int, max_years: int):
     # ======== 6) Determine time to target (deterministic) ========
     det_years, _ = years_to_reach_real_target(
-        initial_investable=investable,
-        annual_contribution=annual_contribution,
-        assumed_annual_return=est_return,
-        inflation_rate=inflation,
+        initial_investable=plan["investable"],
+        annual_contribution=plan["annual_contribution"],
+        assumed_annual_return=plan["estimated_annual_return"],
+        inflation_rate=req.profile.inflation_rate,
         target_present_value=req.target_amount,
         max_years=max_years
     )
 
     return {
-        "disclaimer": DISCLAIMER_TEXT,
-        "profile_summary": {
-            "monthly_income": income,
-            "monthly_expense": expense,
-            "monthly_contribution_declared": declared_contribution,
-            "monthly_contribution_used": actual_contribution,
-            "spare_cash": spare_cash,
-            "current_savings": savings,
-            "emergency_fund_required": emergency_amount,
-            "investable_savings": investable,
-            "emergency_shortfall": shortfall,
-            "readiness": readiness,
-            "readiness_notes": readiness_notes
-        },
+        "profile_summary": plan["profile_summary"],
         "portfolio": {
-            "risk_bucket": rb,
-            "allocation": allocation,
-            "estimated_annual_return": round(est_return, 4),
+            "risk_bucket": plan["risk_bucket"],
+            "allocation": plan["allocation"],
+            "estimated_annual_return": round(plan["estimated_annual_return"], 4),
             "deterministic_years_to_target": det_years,
             "monte_carlo": mc,
             "monte_carlo_sims_used": sims
         }
     }
+
+
+@app.post("/portfolio/analysis")
+async def analysis(req: AnalysisRequest):
+    sims = DEFAULT_MONTE_CARLO_SIMS
+    max_years = DEFAULT_MAX_YEARS
+    plan = plan_profile(req, all_asset_profiles())
+    check_return_model(req.return_model, plan["allocation"])
+
+    # ======== 5) Monte Carlo Simulation ========
+    if (req.seed is None and req.sampling == "plain" and req.return_model == "gbm"
+            and plan["risk_bucket"] in ALLOCATION_RULES):
+        # shared pre-generated paths for the bucket, no sampling per request
+        mc = await pool.run(
+            run_monte_carlo_shared,
+            plan["allocation"],
+            plan["investable"],
+            plan["annual_contribution"],
+            max_years,
+            sims,
+            req.target_amount,
+            req.profile.inflation_rate
+        )
+    else:
+        mc = await pool.run(
+            run_monte_carlo,
+            plan["allocation"],
+            plan["investable"],
+            plan["annual_contribution"],
+            max_years,
+            sims,
+            req.seed,
+            None,
+            req.target_amount,
+            req.profile.inflation_rate,
+            req.sampling,
+            req.return_model
+        )
+
+    return {"disclaimer": DISCLAIMER_TEXT, **portfolio_result(req, plan, mc, sims, max_years)}
+
+
+@app.post("/portfolio/analysis/batch")
+async def analysis_batch(req: BatchAnalysisRequest):
+    """Many profiles per call, one simulation per distinct allocation.
+
+    Profiles are grouped by allocation (risk bucket or identical custom
+    weights); each group runs ``run_monte_carlo_batch``, so the cost is one
+    simulation per group plus a cheap per-profile combination of the shared
+    paths. At most ``BATCH_MAX_ALLOCATIONS`` distinct allocations are
+    accepted (422 above); the groups go to the pool in jobs of
+    ``BATCH_GROUPS_PER_JOB``, at most ``pool.max_workers`` of them at once,
+    so no job runs into the pool timeout and a batch never fills the queue
+    on its own. Without ``req.seed`` the risk buckets use the stored
+    scenario paths (plain sampling, gbm returns). Per-profile seeds and
+    return models are ignored in favour of ``req.seed`` and
+    ``req.return_model``; per-asset medians are not included.
+    """
+    sims = DEFAULT_MONTE_CARLO_SIMS
+    max_years = DEFAULT_MAX_YEARS
+    profiles = all_asset_profiles()
+    plans = [plan_profile(item, profiles) for item in req.requests]
+
+    groups = {}
+    for i, plan in enumerate(plans):
+        key = json.dumps(plan["allocation"], sort_keys=True)
+        groups.setdefault(key, []).append(i)
+    if len(groups) > BATCH_MAX_ALLOCATIONS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"At most {BATCH_MAX_ALLOCATIONS} distinct allocations per batch, got {len(groups)}."
+        )
+    for members in groups.values():
+        check_return_model(req.return_model, plans[members[0]]["allocation"])
+
+    def group_call(n, members):
+        group_plans = [plans[i] for i in members]
+        if (req.seed is None and req.sampling == "plain" and req.return_model == "gbm"
+                and group_plans[0]["risk_bucket"] in ALLOCATION_RULES):
+            return run_monte_carlo_batch_shared, (
+                group_plans[0]["allocation"],
+                [p["investable"] for p in group_plans],
+                [p["annual_contribution"] for p in group_plans],
+                max_years,
+                sims,
+                [req.requests[i].target_amount for i in members],
+                [req.requests[i].profile.inflation_rate for i in members]
+            )
+        return run_monte_carlo_batch, (
+            group_plans[0]["allocation"],
+            [p["investable"] for p in group_plans],
+            [p["annual_contribution"] for p in group_plans],
+            max_years,
+            sims,
+            None if req.seed is None else req.seed + n,
+            [req.requests[i].target_amount for i in members],
+            [req.requests[i].profile.inflation_rate for i in members],
+            None,
+            req.sampling,
+            req.return_model
+        )
+
+    calls = [group_call(n, m) for n, m in enumerate(groups.values())]
+    slots = asyncio.Semaphore(pool.max_workers)
+
+    async def run_chunk(chunk):
+        async with slots:
+            return await pool.run(run_calls, chunk)
+
+    chunks = await asyncio.gather(*(
+        run_chunk(calls[lo:lo + BATCH_GROUPS_PER_JOB]) for lo in range(0, len(calls), BATCH_GROUPS_PER_JOB)
+    ))
+    outputs = [mcs for chunk in chunks for mcs in chunk]
+
+    results = [None] * len(plans)
+    for members, mcs in zip(groups.values(), outputs):
+        for i, mc in zip(members, mcs):
+            results[i] = portfolio_result(req.requests[i], plans[i], mc, sims, max_years)
+
+    return {
+        "disclaimer": DISCLAIMER_TEXT,
+        "groups": [
+            {"risk_bucket": plans[m[0]]["risk_bucket"], "allocation": plans[m[0]]["allocation"], "profiles": len(m)}
+            for m in groups.values()
+        ],
+        "results": results
+    }
+
+
+@app.post("/portfolio/years_to_target/batch")
+def years_to_target_batch(req: YearsToTargetBatchRequest):
+    # deterministic years-to-target over the grid bucket x contribution x target
+    buckets = [b.lower() for b in req.risk_buckets] if req.risk_buckets else list(ALLOCATION_RULES)
+    unknown = sorted(set(buckets) - set(ALLOCATION_RULES))
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown risk buckets: {', '.join(unknown)}")
+
+    profiles = all_asset_profiles()
+    returns = np.array([
+        sum(profiles[a]["mean"] * pct for a, pct in ALLOCATION_RULES[b].items()) for b in buckets
+    ])
+    contributions = np.asarray(req.monthly_contributions, dtype=float)
+    targets = np.asarray(req.target_amounts, dtype=float)
+
+    years, real_balance = years_to_reach_real_target_batch(
+        req.current_investable,
+        contributions[None, :, None] * 12,
+        returns[:, None, None],
+        req.inflation_rate,
+        targets[None, None, :],
+        req.max_years
+    )
+
+    results = [
+        {
+            "risk_bucket": b,
+            "estimated_annual_return": round(float(returns[i]), 4),
+            "monthly_contribution": float(contributions[j]),
+            "target_amount": float(targets[k]),
+            "years_to_target": int(years[i, j, k]) if years[i, j, k] >= 0 else None,
+            "real_balance": round(float(real_balance[i, j, k]), 2)
+        }
+        for i, b in enumerate(buckets)
+        for j in range(len(contributions))
+        for k in range(len(targets))
+    ]
+    return {"disclaimer": DISCLAIMER_TEXT, "max_years": req.max_years, "results": results}
@@ -1,4 +1,5 @@
 # constants.py
+import os
 
 DISCLAIMER_TEXT = """
 หมายเหตุสำคัญ:
@@ -10,22 +11,28 @@ DISCLAIMER_TEXT = """
      ไม่ใช่ค่าที่อ้างอิงถึงสินทรัพย์จริงใด ๆ เป็นการเฉพาะ
 
 2) วิธีการคำนวณโดยสรุป:
-   - ระบบใช้ Monte Carlo Simulation แบบสุ่มผลตอบแทนรายปีด้วยฟังก์ชัน random.gauss(mean, vol)
+   - ระบบใช้ Monte Carlo Simulation แบบสุ่มผลตอบแทนรายปีจากการแจกแจงปกติ (numpy Generator.normal(mean, vol))
+     เป็นค่าเริ่มต้น (return_model = gbm) หรือเลือกได้ว่าจะใช้
+     student_t (การแจกแจงหางหนา ค่า mean, volatility และ correlation เท่าเดิม) หรือ
+     bootstrap (สุ่มช่วง 12 เดือนจากราคาย้อนหลังจริงของดัชนี SET_* ส่วนสินทรัพย์ตัวอย่างยังใช้การแจกแจงปกติ)
    - เงินออมปัจจุบัน (หลังหักเงินฉุกเฉิน) จะถูกแบ่งตามสัดส่วนพอร์ต (allocation)
    - เงินออมรายเดือนจะถูกแปลงเป็นเงินออมรายปีแล้วแบ่งเข้าสินทรัพย์ตามสัดส่วนพอร์ตเช่นกัน
    - ใช้ผลตอบแทนคาดหวัง (expected return) และความผันผวน (volatility) 
      เพื่อจำลองความเป็นไปได้ของมูลค่าพอร์ตในระยะยาว
    - ไม่มีการปรับพอร์ต (no rebalancing)
    - ไม่มีการปรับสัดส่วนพอร์ตตามอายุผู้ใช้
-   - ไม่มีการใช้ข้อมูลราคาในตลาดจริงของประเทศไทย
+   - สินทรัพย์ตัวอย่างข้างต้นไม่ได้ใช้ข้อมูลราคาในตลาดจริงของประเทศไทย
+   - ยกเว้นสินทรัพย์กลุ่ม SET_* (ดัชนีหมวดอุตสาหกรรมของ SET) ซึ่งประมาณค่า mean, volatility
+     และความสัมพันธ์ (correlation) ระหว่างกันจากราคารายเดือนย้อนหลังประมาณ 15 ปี
 
 3) สิ่งที่ “ยังไม่ได้พิจารณา” ในระบบเวอร์ชันนี้:
    - หนี้สิน การเปลี่ยนแปลงยอดหนี้ หรือดอกเบี้ยของหนี้ที่เพิ่มตามเวลา
    - การเพิ่มขึ้นของค่าใช้จ่ายในอนาคต
    - การเพิ่มขึ้นของรายได้ตามอายุงาน
    - การเปลี่ยนสัดส่วนทรัพย์สินระหว่างทาง (rebalancing)
-   - ความเสี่ยงในตลาดจริงที่มี fat tails, black swans หรือ extreme events
-   - ความสัมพันธ์ระหว่างสินทรัพย์ (correlation)
+   - ความเสี่ยงในตลาดจริงที่มี fat tails (ยกเว้นเมื่อเลือก return_model = student_t หรือ bootstrap
+     ซึ่งจำลองได้เพียงบางส่วน), black swans หรือ extreme events ที่ไม่เคยเกิดในข้อมูลย้อนหลัง
+   - ความสัมพันธ์ระหว่างสินทรัพย์ตัวอย่าง (correlation) ยกเว้นระหว่างดัชนี SET_* ด้วยกัน
    - ภาษี ค่าธรรมเนียม ธรรมเนียมซื้อขาย หรือผลกระทบจาก FX exchange rate
    - การชะลอหรือหยุดการออมในบางช่วง
    - ผลกระทบจากเศรษฐกิจจริง หรือราคาสินทรัพย์เฉพาะตัวของบริษัทหรือกองทุนใด ๆ
@@ -44,6 +51,19 @@ ASSET_PROFILES = {
     "REITS": {"label": "REITs / Real Assets (representative)", "mean": 0.05, "vol": 0.12},
 }
 
+# Real SET industry indexes (monthly history in data/stockdata), see market_data.py
+STOCKDATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "stockdata")
+INDUSTRY_INDEX_ASSETS = {
+    "SET_INDUS": "Industrial",
+    "SET_TECH": "Technology",
+    "SET_CONSUMP": "Consumer Products",
+    "SET_PROPCON": "Property & Construction",
+    "SET_AGRO": "Agro & Food Industry",
+    "SET_SERVICE": "Services",
+    "SET_RESOURC": "Resources",
+    "SET_FINCIAL": "Financials",
+}
+
 ALLOCATION_RULES = {
     "conservative": {"CASH": 0.30, "BONDS": 0.50, "DOM_EQUITY": 0.10, "INT_EQUITY": 0.05, "REITS": 0.05},
     "moderate":     {"CASH": 0.10, "BONDS": 0.40, "DOM_EQUITY": 0.30, "INT_EQUITY": 0.15, "REITS": 0.05},
@@ -55,6 +75,35 @@ DEFAULT_MONTE_CARLO_SIMS = 5000
 DEFAULT_MAX_YEARS = 50
 DEFAULT_INFLATION = 0.02  # 2%
 
+# Above this many paths run_monte_carlo streams batches through a quantile
+# sketch (bounded memory, relative error SKETCH_RELATIVE_ERROR) instead of
+# holding every path for exact percentiles
+EXACT_QUANTILE_MAX_SIMS = 20000
+STREAMING_BATCH_SIMS = 5000
+SKETCH_RELATIVE_ERROR = 0.002
+
+# Shared scenario store: seeded unit-return paths per ALLOCATION_RULES bucket,
+# memory-mapped from .npy files so every worker process reads the same pages
+SCENARIO_DIR = os.environ.get(
+    "PORTFOLIO_SCENARIO_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "data", "scenarios")
+)
+SCENARIO_SEED = 20240601
+
+# Batch analysis: max profiles evaluated together on the shared unit paths
+# (memory is chunk x sims x years floats) and max profiles per request
+BATCH_PROFILE_CHUNK = 16
+BATCH_MAX_PROFILES = 1000
+# Distinct allocations (one simulation each, ~0.2 s at the defaults) per batch
+# request, and per pool job so a job stays well inside POOL_TIMEOUT
+BATCH_MAX_ALLOCATIONS = 64
+BATCH_GROUPS_PER_JOB = 8
+
+# Simulation worker pool (see workers.py)
+POOL_WORKERS = int(os.environ.get("PORTFOLIO_POOL_WORKERS", os.cpu_count() or 1))
+POOL_QUEUE = int(os.environ.get("PORTFOLIO_POOL_QUEUE", 2 * POOL_WORKERS))
+POOL_TIMEOUT = float(os.environ.get("PORTFOLIO_POOL_TIMEOUT", 30))
+
 # Heuristics
 DEBT_SERVICE_RATIO_WARN = 0.35
 MIN_EMERGENCY_MONTHS = 3
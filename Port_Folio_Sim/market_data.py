@@ -0,0 +1,111 @@
+# market_data.py
+import os
+import threading
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from constants import ASSET_PROFILES, INDUSTRY_INDEX_ASSETS, STOCKDATA_DIR
+
+_lock = threading.Lock()
+_cache = {}
+
+
+def _csv_path(industry: str) -> str:
+    return os.path.join(STOCKDATA_DIR, industry + ".csv")
+
+
+def _mtimes() -> Tuple[float, ...]:
+    return tuple(os.path.getmtime(_csv_path(ind)) for ind in INDUSTRY_INDEX_ASSETS.values())
+
+
+def _industry_prices() -> pd.DataFrame:
+    """Monthly closes of the SET industry indexes over their common history."""
+    return pd.concat(
+        [pd.read_csv(_csv_path(ind), index_col=0, parse_dates=True).iloc[:, 0].rename(key)
+         for key, ind in INDUSTRY_INDEX_ASSETS.items()],
+        axis=1
+    ).dropna()
+
+
+def _estimate_industry_model():
+    """Annual arithmetic mean / vol and correlation of the SET industry indexes.
+
+    Monthly log returns over the common history give an annual log-normal
+    model (mean 12*mu, covariance 12*Sigma), converted to the arithmetic
+    moments the simulation engine draws from. Also returns the table the
+    bootstrap return model resamples (see ``industry_annual_table``).
+    """
+    prices = _industry_prices()
+    log_returns = np.log(prices / prices.shift(1)).dropna().to_numpy()
+
+    mu = log_returns.mean(axis=0) * 12.0
+    cov = np.cov(log_returns, rowvar=False) * 12.0
+    var = np.diag(cov)
+
+    m = np.exp(mu + 0.5 * var)
+    cov_arith = np.outer(m, m) * np.expm1(cov)
+    vol = np.sqrt(np.diag(cov_arith))
+    corr = cov_arith / np.outer(vol, vol)
+
+    profiles = {
+        key: {"label": f"SET {ind} Index", "mean": float(m[i] - 1.0), "vol": float(vol[i])}
+        for i, (key, ind) in enumerate(INDUSTRY_INDEX_ASSETS.items())
+    }
+    # every 12-month window of the joint history as an annual arithmetic
+    # return, standardized per index: (windows, indexes), rows keep the
+    # indexes' co-movement and the empirical skew and tails
+    window = np.lib.stride_tricks.sliding_window_view(log_returns, 12, axis=0).sum(axis=-1)
+    annual = np.expm1(window)
+    table = (annual - annual.mean(axis=0)) / annual.std(axis=0, ddof=1)
+    return (profiles, corr, str(prices.index[-1])[:10]), table
+
+
+def _cached():
+    stamp = _mtimes()
+    with _lock:
+        if _cache.get("stamp") != stamp:
+            _cache["model"], _cache["table"] = _estimate_industry_model()
+            _cache["stamp"] = stamp
+        return _cache["model"], _cache["table"]
+
+
+def industry_model():
+    """(profiles, correlation, last_date), estimated once per process.
+
+    Re-estimated only when one of the index CSVs has been rebuilt.
+    """
+    return _cached()[0]
+
+
+def industry_annual_table() -> np.ndarray:
+    """Standardized annual returns of the industry indexes, one row per
+    12-month window of their common monthly history (columns in the order
+    of ``INDUSTRY_INDEX_ASSETS``), cached like ``industry_model``."""
+    return _cached()[1]
+
+
+def all_asset_profiles() -> Dict[str, dict]:
+    profiles, _, _ = industry_model()
+    return {**ASSET_PROFILES, **profiles}
+
+
+def asset_model(assets: List[str]):
+    """Means, vols and Cholesky factor of the correlation for ``assets``.
+
+    The representative assets are independent of everything; the industry
+    indexes keep their historical correlation with each other.
+    """
+    industry_profiles, industry_corr, _ = industry_model()
+    profiles = {**ASSET_PROFILES, **industry_profiles}
+    keys = list(industry_profiles.keys())
+
+    means = np.array([profiles[a]["mean"] for a in assets])
+    vols = np.array([profiles[a]["vol"] for a in assets])
+    corr = np.eye(len(assets))
+    for i, a in enumerate(assets):
+        for j, b in enumerate(assets):
+            if a in industry_profiles and b in industry_profiles:
+                corr[i, j] = industry_corr[keys.index(a), keys.index(b)]
+    return means, vols, np.linalg.cholesky(corr)
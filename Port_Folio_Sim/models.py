@@ -1,6 +1,9 @@
 # models.py
-from pydantic import BaseModel, Field
-from typing import Optional
+from pydantic import BaseModel, Field, field_validator
+from typing import Dict, List, Literal, Optional
+
+from constants import BATCH_MAX_PROFILES
+
 
 class UserProfile(BaseModel):
     monthly_income: float = Field(..., ge=0, description="รายได้ต่อเดือน (บาท)")
@@ -16,3 +19,52 @@ class UserProfile(BaseModel):
 class AnalysisRequest(BaseModel):
     profile: UserProfile
     target_amount: float = Field(..., gt=0, description="ยอดเงินเป้าหมาย (บาท)")
+    seed: Optional[int] = Field(None, ge=0, description="ค่า seed ของตัวสุ่ม (ระบุเพื่อให้ผลจำลองซ้ำได้)")
+    allocation: Optional[Dict[str, float]] = Field(
+        None,
+        description="สัดส่วนพอร์ตที่กำหนดเอง เช่น {\"BONDS\": 0.4, \"SET_FINCIAL\": 0.6} (ถ้าระบุจะใช้แทน risk_bucket)"
+    )
+    sampling: Literal["plain", "antithetic", "moment_matching", "sobol"] = Field(
+        "plain", description="วิธีสุ่มตัวอย่าง (plain / antithetic / moment_matching / sobol)"
+    )
+    return_model: Literal["gbm", "student_t", "bootstrap"] = Field(
+        "gbm", description="แบบจำลองผลตอบแทน (gbm = แจกแจงปกติ / student_t = หางหนา / bootstrap = สุ่มจากข้อมูลย้อนหลังของดัชนี SET_*)"
+    )
+
+    @field_validator("allocation")
+    @classmethod
+    def check_allocation(cls, v):
+        if v is None:
+            return v
+        if not v or any(pct < 0 for pct in v.values()):
+            raise ValueError("allocation must be non-empty with non-negative weights")
+        if abs(sum(v.values()) - 1.0) > 1e-6:
+            raise ValueError("allocation weights must sum to 1")
+        return v
+
+
+class BatchAnalysisRequest(BaseModel):
+    requests: List[AnalysisRequest] = Field(..., min_length=1, max_length=BATCH_MAX_PROFILES, description="รายการคำขอวิเคราะห์พอร์ต")
+    seed: Optional[int] = Field(None, ge=0, description="ค่า seed ของตัวสุ่มสำหรับทั้งชุด (ใช้แทน seed รายคน)")
+    sampling: Literal["plain", "antithetic", "moment_matching", "sobol"] = Field(
+        "plain", description="วิธีสุ่มตัวอย่างสำหรับทั้งชุด (ใช้แทนค่ารายคน)"
+    )
+    return_model: Literal["gbm", "student_t", "bootstrap"] = Field(
+        "gbm", description="แบบจำลองผลตอบแทนสำหรับทั้งชุด (ใช้แทนค่ารายคน)"
+    )
+
+
+class YearsToTargetBatchRequest(BaseModel):
+    current_investable: float = Field(..., ge=0, description="เงินลงทุนตั้งต้น (บาท)")
+    monthly_contributions: List[float] = Field(..., min_length=1, max_length=100, description="จำนวนเงินลงทุนต่อเดือนที่ต้องการเทียบ")
+    target_amounts: List[float] = Field(..., min_length=1, max_length=100, description="ยอดเงินเป้าหมายที่ต้องการเทียบ (มูลค่าปัจจุบัน)")
+    risk_buckets: Optional[List[str]] = Field(None, description="ระดับความเสี่ยงที่ต้องการเทียบ (ไม่ระบุ = ทุกระดับ)")
+    inflation_rate: float = Field(0.02, description="อัตราเงินเฟ้อที่ใช้ในการคำนวณ (default = 2%)")
+    max_years: int = Field(50, ge=1, le=100, description="จำนวนปีสูงสุดที่คำนวณ")
+
+    @field_validator("monthly_contributions", "target_amounts")
+    @classmethod
+    def check_non_negative(cls, v):
+        if any(x < 0 for x in v):
+            raise ValueError("values must be non-negative")
+        return v
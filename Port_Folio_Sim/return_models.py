@@ -0,0 +1,72 @@
+# return_models.py
+import numpy as np
+
+from constants import INDUSTRY_INDEX_ASSETS
+from market_data import industry_annual_table
+
+
+# gbm: jointly normal annual returns (the original model)
+# student_t: multivariate Student-t annual returns with the same mean, vol
+#   and correlation; one mixing variable per (path, year) shared by every
+#   asset, so bad years hit all assets together
+# bootstrap: SET_* assets draw whole 12-month windows of the joint industry
+#   history (same window for every index in a path-year); the representative
+#   assets, which have no history, stay normal
+RETURN_MODELS = ("gbm", "student_t", "bootstrap")
+STUDENT_T_DF = 5.0
+# rows of the precomputed Student-t scale table
+TABLE_SIZE = 2**14
+
+_scale_table = None
+
+
+def student_t_scales() -> np.ndarray:
+    """sqrt of the mean of 12 monthly unit-variance mixing variables,
+    ``(df - 2) / chi2(df)``: the scale of an annual sum of Student-t months.
+    Built once with a fixed seed."""
+    global _scale_table
+    if _scale_table is None:
+        rng = np.random.default_rng(0)
+        w = (STUDENT_T_DF - 2.0) / rng.chisquare(STUDENT_T_DF, (12, TABLE_SIZE))
+        _scale_table = np.sqrt(w.mean(axis=0))
+    return _scale_table
+
+
+class ReturnModel:
+    """Standardized annual shocks for ``growth = 1 + mean + vol * shock``.
+
+    ``shocks(z, chol)`` takes the sampler's normals (sims, years, assets) and
+    returns shocks with zero mean, unit variance and the correlation behind
+    ``chol``; the Gaussian model is exactly the original ``z @ chol.T``.
+    """
+
+    def __init__(self, name: str, assets, rng: np.random.Generator):
+        if name not in RETURN_MODELS:
+            raise ValueError(f"return_model must be one of {', '.join(RETURN_MODELS)}")
+        self.name = name
+        self.rng = rng
+        keys = list(INDUSTRY_INDEX_ASSETS)
+        self.industry = [(i, keys.index(a)) for i, a in enumerate(assets) if a in INDUSTRY_INDEX_ASSETS]
+
+    def shocks(self, z: np.ndarray, chol: np.ndarray) -> np.ndarray:
+        if self.name == "bootstrap" and self.industry:
+            return self._bootstrap(z, chol)
+        shocks = z @ chol.T
+        if self.name == "student_t":
+            rows = self.rng.integers(0, TABLE_SIZE, z.shape[:-1])
+            shocks *= student_t_scales()[rows][..., None]
+        return shocks
+
+    def _bootstrap(self, z, chol):
+        from scipy.special import ndtr
+
+        # the first industry asset's normal picks the window, so antithetic
+        # and Sobol' sampling still stratify it
+        table = industry_annual_table()
+        cols, table_cols = (list(c) for c in zip(*self.industry))
+        rows = np.minimum((ndtr(z[..., cols[0]]) * len(table)).astype(np.int64), len(table) - 1)
+        # industry assets are independent of the representative ones, so the
+        # latter keep their normals
+        shocks = z @ chol.T
+        shocks[..., cols] = table[rows][..., table_cols]
+        return shocks
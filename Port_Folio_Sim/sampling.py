@@ -0,0 +1,8 @@
+# sampling.py
+from shared import load_app_module
+
+# the forecast API's samplers (app/MS_Sampling.py), one implementation for both
+_sampling = load_app_module("MS_Sampling")
+
+SAMPLING_METHODS = _sampling.SAMPLING_METHODS
+NormalSampler = _sampling.NormalSampler
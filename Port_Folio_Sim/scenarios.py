@@ -0,0 +1,127 @@
+# scenarios.py
+import hashlib
+import json
+import os
+import threading
+from typing import Dict
+
+import numpy as np
+
+from constants import ALLOCATION_RULES, SCENARIO_DIR, SCENARIO_SEED
+from market_data import asset_model
+from simulation import run_monte_carlo_batch, simulate_unit_asset_paths, summarize_unit_paths
+
+# bump when the layout or the meaning of the stored paths changes
+SCENARIO_FORMAT = 1
+
+
+def scenario_key(allocation: Dict[str, float], years: int, simulations: int, seed: int) -> str:
+    """Content hash of everything the stored paths depend on.
+
+    Includes the asset model itself, so a change to ``ASSET_PROFILES`` or a
+    rebuilt industry index produces a new key and the paths are regenerated.
+    """
+    means, vols, chol = asset_model(list(allocation.keys()))
+    payload = {
+        "format": SCENARIO_FORMAT,
+        "assets": list(allocation.keys()),
+        "years": years,
+        "simulations": simulations,
+        "seed": seed,
+        "means": means.tolist(),
+        "vols": vols.tolist(),
+        "chol": chol.tolist()
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()[:16]
+
+
+class ScenarioStore:
+    """Seeded per-asset unit paths, generated once and memory-mapped.
+
+    Paths depend only on the assets of an allocation and the asset model,
+    never on a profile, so they are stored as ``<key>.G.npy`` / ``<key>.H.npy``
+    under ``root`` and opened read-only with ``mmap_mode``: worker processes
+    share the page cache instead of each holding a copy, and no random
+    numbers are drawn on the request path. Files are written atomically, so a
+    concurrent reader never sees a partial file.
+    """
+
+    def __init__(self, root: str = SCENARIO_DIR, seed: int = SCENARIO_SEED):
+        self.root = root
+        self.seed = seed
+        self._open = {}
+        self._lock = threading.Lock()
+
+    def _paths(self, key: str):
+        return os.path.join(self.root, key + ".G.npy"), os.path.join(self.root, key + ".H.npy")
+
+    def _generate(self, allocation, years, simulations, key):
+        os.makedirs(self.root, exist_ok=True)
+        G, H = simulate_unit_asset_paths(allocation, years, simulations, np.random.default_rng(self.seed))
+        for path, arr in zip(self._paths(key), (G, H)):
+            tmp = f"{path}.{os.getpid()}.tmp"
+            with open(tmp, "wb") as f:
+                np.save(f, arr)
+            os.replace(tmp, path)
+
+    def get(self, allocation: Dict[str, float], years: int, simulations: int):
+        """(G, H) memory-mapped, each (simulations, years + 1, n_assets)."""
+        key = scenario_key(allocation, years, simulations, self.seed)
+        with self._lock:
+            if key not in self._open:
+                g_path, h_path = self._paths(key)
+                if not (os.path.exists(g_path) and os.path.exists(h_path)):
+                    self._generate(allocation, years, simulations, key)
+                self._open[key] = (np.load(g_path, mmap_mode="r"), np.load(h_path, mmap_mode="r"))
+            return self._open[key]
+
+    def warm(self, years: int, simulations: int, rules: Dict[str, Dict[str, float]] = ALLOCATION_RULES):
+        """Make sure every allocation rule has its paths; drop stale files."""
+        keep = set()
+        for allocation in rules.values():
+            self.get(allocation, years, simulations)
+            keep.add(scenario_key(allocation, years, simulations, self.seed))
+        for name in os.listdir(self.root):
+            if name.endswith(".npy") and name.split(".")[0] not in keep:
+                try:
+                    os.remove(os.path.join(self.root, name))
+                except OSError:
+                    pass
+        return sorted(keep)
+
+
+store = ScenarioStore()
+
+
+def run_monte_carlo_shared(
+    allocation: Dict[str, float],
+    investable_balance: float,
+    annual_contribution: float,
+    years: int,
+    simulations: int,
+    target_present_value=None,
+    inflation_rate: float = 0.0
+):
+    # pool entry point: the worker maps the stored paths itself
+    return summarize_unit_paths(
+        allocation, store.get(allocation, years, simulations),
+        investable_balance, annual_contribution, target_present_value, inflation_rate
+    )
+
+
+def run_monte_carlo_batch_shared(
+    allocation: Dict[str, float],
+    investable_balances,
+    annual_contributions,
+    years: int,
+    simulations: int,
+    target_present_values=None,
+    inflation_rates=0.0
+):
+    weights = np.array(list(allocation.values()))
+    G, H = store.get(allocation, years, simulations)
+    return run_monte_carlo_batch(
+        allocation, investable_balances, annual_contributions, years, simulations,
+        target_present_values=target_present_values, inflation_rates=inflation_rates,
+        unit_paths=(G @ weights, H @ weights)
+    )
@@ -0,0 +1,25 @@
+# shared.py
+import importlib.util
+import os
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app")
+
+
+def load_app_module(name: str):
+    """Import ``app/<name>.py`` of the forecast API from its file.
+
+    Both services share modules that only need the standard library and
+    numpy (the samplers, the process pool). They cannot be imported as
+    ``app.<name>`` here because this service's own ``app.py`` shadows the
+    forecast API's ``app`` package, so they are loaded by path, once per
+    process, as ``ms_<name>``.
+    """
+    key = "ms_" + name
+    module = sys.modules.get(key)
+    if module is None:
+        spec = importlib.util.spec_from_file_location(key, os.path.join(APP_DIR, name + ".py"))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[key] = module
+        spec.loader.exec_module(module)
+    return module
@@ -1,46 +1,178 @@
 # simulation.py
-import random
-import math
-from typing import Dict, List
-from constants import ASSET_PROFILES, DEFAULT_MAX_YEARS
-
-
-def percentile(sorted_list: List[float], p: float) -> float:
-    if not sorted_list:
-        return 0.0
-    k = (len(sorted_list) - 1) * (p / 100.0)
-    f = math.floor(k)
-    c = math.ceil(k)
-    if f == c:
-        return float(sorted_list[int(k)])
-    d0 = sorted_list[int(f)] * (c - k)
-    d1 = sorted_list[int(c)] * (k - f)
-    return float(d0 + d1)
-
-
-def simulate_one_path(
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from constants import (
+    BATCH_PROFILE_CHUNK,
+    DEFAULT_MAX_YEARS,
+    EXACT_QUANTILE_MAX_SIMS,
+    SKETCH_RELATIVE_ERROR,
+    STREAMING_BATCH_SIMS
+)
+from market_data import asset_model
+from return_models import ReturnModel
+from sampling import NormalSampler
+from sketch import QuantileSketch
+
+
+PERCENTILES = (10, 50, 90)
+
+
+def simulate_paths(
     allocation: Dict[str, float],
     initial_amount_by_asset: Dict[str, float],
     annual_contribution_by_asset: Dict[str, float],
-    years: int
-) -> Dict[str, List[float]]:
+    years: int,
+    simulations: int,
+    rng: np.random.Generator,
+    sampler: Optional[NormalSampler] = None,
+    model: Optional[ReturnModel] = None
+) -> np.ndarray:
+    """Simulate every path at once.
+
+    Returns balances with shape (simulations, years + 1, n_assets), assets in
+    the order of ``allocation``. Returns are drawn jointly: one standard-normal
+    tensor, correlated through the Cholesky factor of the asset correlation.
+    ``sampler`` (dimension years * n_assets) replaces the plain draws and
+    ``model`` (``return_models.py``) the Gaussian returns.
+    """
+    assets = list(allocation.keys())
+    means, vols, chol = asset_model(assets)
+    initial = np.array([initial_amount_by_asset.get(a, 0.0) for a in assets])
+    contrib = np.array([annual_contribution_by_asset.get(a, 0.0) for a in assets])
 
-    balances = {asset: [initial_amount_by_asset.get(asset, 0.0)] for asset in allocation.keys()}
+    # Whole (sims x years x assets) return tensor in one draw
+    if sampler is None:
+        z = rng.standard_normal((simulations, years, len(assets)))
+    else:
+        z = sampler.draw(simulations).reshape(simulations, years, len(assets))
+    shocks = z @ chol.T if model is None else model.shocks(z, chol)
+    growth = 1.0 + means + vols * shocks
 
+    balances = np.empty((simulations, years + 1, len(assets)))
+    balances[:, 0, :] = initial
     for y in range(1, years + 1):
-        for asset in allocation.keys():
+        step = balances[:, y, :]
+        np.multiply(balances[:, y - 1, :], growth[:, y - 1, :], out=step)
+        step += contrib
+        np.maximum(step, 0.0, out=step)
 
-            prev = balances[asset][-1]
-            mean = ASSET_PROFILES[asset]["mean"]
-            vol = ASSET_PROFILES[asset]["vol"]
+    return balances
+
+
+def simulate_unit_asset_paths(
+    allocation: Dict[str, float],
+    years: int,
+    simulations: int,
+    rng: np.random.Generator,
+    sampling: str = "plain",
+    return_model: str = "gbm"
+):
+    """Per-asset paths for one unit of initial balance and one unit of contribution.
 
-            # Random simulated return
-            r = random.gauss(mean, vol)
+    Returns ``(G, H)``, each (simulations, years + 1, n_assets), assets in the
+    order of ``allocation``. An asset holding ``initial`` and receiving
+    ``contribution`` per year is worth ``initial * G + contribution * H`` on
+    the same draws, so any number of profiles sharing an allocation reuse one
+    simulation. Annual growth is floored at 0 (an asset cannot lose more than
+    it holds), which keeps the decomposition exact; ``simulate_paths`` instead
+    floors the balance after the contribution, which differs only on paths
+    with a worse than -100% year.
+    """
+    assets = list(allocation.keys())
+    means, vols, chol = asset_model(assets)
 
-            new_balance = prev * (1 + r) + annual_contribution_by_asset.get(asset, 0.0)
-            balances[asset].append(max(new_balance, 0.0))
+    z = NormalSampler(years * len(assets), sampling, rng).draw(simulations).reshape(simulations, years, len(assets))
+    shocks = ReturnModel(return_model, assets, rng).shocks(z, chol)
+    growth = np.maximum(1.0 + means + vols * shocks, 0.0)
 
-    return balances
+    G = np.empty((simulations, years + 1, len(assets)))
+    H = np.empty((simulations, years + 1, len(assets)))
+    G[:, 0, :], H[:, 0, :] = 1.0, 0.0
+    for y in range(1, years + 1):
+        np.multiply(G[:, y - 1, :], growth[:, y - 1, :], out=G[:, y, :])
+        np.multiply(H[:, y - 1, :], growth[:, y - 1, :], out=H[:, y, :])
+        H[:, y, :] += 1.0
+    return G, H
+
+
+def simulate_unit_paths(
+    allocation: Dict[str, float],
+    years: int,
+    simulations: int,
+    rng: np.random.Generator,
+    sampling: str = "plain",
+    return_model: str = "gbm"
+):
+    """Portfolio-level ``simulate_unit_asset_paths``: (G, H), each (simulations, years + 1)."""
+    weights = np.array(list(allocation.values()))
+    G, H = simulate_unit_asset_paths(allocation, years, simulations, rng, sampling, return_model)
+    return G @ weights, H @ weights
+
+
+def run_monte_carlo_batch(
+    allocation: Dict[str, float],
+    investable_balances,
+    annual_contributions,
+    years: int,
+    simulations: int,
+    seed: Optional[int] = None,
+    target_present_values=None,
+    inflation_rates=0.0,
+    unit_paths=None,
+    sampling: str = "plain",
+    return_model: str = "gbm"
+):
+    """``run_monte_carlo`` for many profiles sharing one allocation.
+
+    The allocation is simulated once (``simulate_unit_paths``); each profile is
+    a linear combination of the shared paths, evaluated ``BATCH_PROFILE_CHUNK``
+    profiles at a time. Returns one result per profile with the portfolio
+    percentiles and, when targets are given, the time-to-target distribution.
+    Per-asset medians are not computed here. ``unit_paths`` supplies
+    precomputed portfolio-level ``(G, H)`` instead of simulating.
+    """
+    if unit_paths is None:
+        unit_paths = simulate_unit_paths(
+            allocation, years, simulations, np.random.default_rng(seed), sampling, return_model
+        )
+    G, H = unit_paths
+
+    initial = np.asarray(investable_balances, dtype=float)
+    contrib = np.asarray(annual_contributions, dtype=float)
+    n = len(initial)
+    inflation = np.broadcast_to(np.asarray(inflation_rates, dtype=float), (n,))
+    targets = None if target_present_values is None else np.asarray(target_present_values, dtype=float)
+
+    results = []
+    for lo in range(0, n, BATCH_PROFILE_CHUNK):
+        hi = min(lo + BATCH_PROFILE_CHUNK, n)
+        totals = initial[lo:hi, None, None] * G + contrib[lo:hi, None, None] * H
+        pct = np.percentile(totals, PERCENTILES, axis=1)
+        hits = None
+        if targets is not None:
+            hits = first_hit_years(totals, inflation[lo:hi], targets[lo:hi])
+        for k in range(hi - lo):
+            result = {
+                "portfolio_percentiles": [
+                    {
+                        "year": y,
+                        "p10": round(float(pct[0, k, y]), 2),
+                        "p50": round(float(pct[1, k, y]), 2),
+                        "p90": round(float(pct[2, k, y]), 2)
+                    }
+                    for y in range(years + 1)
+                ],
+                "simulations_used": simulations,
+                "quantile_method": "exact",
+                "quantile_relative_error": 0.0
+            }
+            if hits is not None:
+                counts = np.bincount(np.where(hits[k] < 0, years + 1, hits[k]), minlength=years + 2)
+                result["time_to_target"] = time_to_target_summary(counts, simulations, float(targets[lo + k]))
+            results.append(result)
+    return results
 
 
 def run_monte_carlo(
@@ -48,59 +180,190 @@ def run_monte_carlo(
     investable_balance: float,
     annual_contribution: float,
     years: int,
-    simulations: int
+    simulations: int,
+    seed: Optional[int] = None,
+    batch_size: Optional[int] = None,
+    target_present_value: Optional[float] = None,
+    inflation_rate: float = 0.0,
+    sampling: str = "plain",
+    return_model: str = "gbm"
 ):
+    """Per-year portfolio percentiles and per-asset medians.
+
+    Up to ``EXACT_QUANTILE_MAX_SIMS`` paths are simulated at once and the
+    quantiles are exact. Larger runs (or an explicit ``batch_size`` below
+    ``simulations``) stream batches through a ``QuantileSketch``: memory stays
+    bounded by the batch size and the sketch, and every reported value is
+    within ``SKETCH_RELATIVE_ERROR`` of an exact sample quantile.
+
+    With ``target_present_value`` the same paths also give the time-to-target
+    distribution (first year the inflation-adjusted total reaches it); it is
+    tallied as a per-year histogram, so it costs no extra simulation.
+
+    ``sampling`` selects the normal sampler (see ``sampling.py``); one
+    sampler spans all batches, so a Sobol' sequence is not restarted.
+    ``return_model`` picks the distribution of the annual returns (see
+    ``return_models.py``).
+    """
+
+    rng = np.random.default_rng(seed)
+    assets = list(allocation.keys())
+    sampler = None if sampling == "plain" else NormalSampler(years * len(assets), sampling, rng)
+    model = None if return_model == "gbm" else ReturnModel(return_model, assets, rng)
 
     initial_by_asset = {asset: investable_balance * pct for asset, pct in allocation.items()}
     annual_contrib_by_asset = {asset: annual_contribution * pct for asset, pct in allocation.items()}
 
-    # portfolio totals for each year
-    portfolio_totals_per_year = [[] for _ in range(years + 1)]
-
-    for _ in range(simulations):
-        path = simulate_one_path(allocation, initial_by_asset, annual_contrib_by_asset, years)
-        for y in range(years + 1):
-            total = sum(path[asset][y] for asset in allocation.keys())
-            portfolio_totals_per_year[y].append(total)
-
-    # percentiles
-    portfolio_percentiles = []
-    for y in range(years + 1):
-        arr = sorted(portfolio_totals_per_year[y])
-        p10 = percentile(arr, 10)
-        p50 = percentile(arr, 50)
-        p90 = percentile(arr, 90)
-        portfolio_percentiles.append({
+    if batch_size is None:
+        batch_size = simulations if simulations <= EXACT_QUANTILE_MAX_SIMS else STREAMING_BATCH_SIMS
+    batch_size = max(1, min(batch_size, simulations))
+    # first-hit year histogram, last slot counts paths that never hit
+    hit_counts = np.zeros(years + 2, dtype=np.int64)
+
+    def count_hits(totals):
+        if target_present_value is not None:
+            hits = first_hit_years(totals, inflation_rate, target_present_value)
+            hit_counts[:] += np.bincount(np.where(hits < 0, years + 1, hits), minlength=years + 2)
+
+    if batch_size == simulations:
+        balances = simulate_paths(allocation, initial_by_asset, annual_contrib_by_asset, years, simulations, rng, sampler, model)
+        totals = balances.sum(axis=2)
+        count_hits(totals)
+        # percentiles of the portfolio total, one column per year
+        p10, p50, p90 = np.percentile(totals, PERCENTILES, axis=0)
+        # per-asset medians come from the same paths, no extra draws needed
+        asset_medians = np.median(balances, axis=0)
+        method, rel_error = "exact", 0.0
+    else:
+        total_sketch = QuantileSketch(years + 1, alpha=SKETCH_RELATIVE_ERROR)
+        asset_sketch = QuantileSketch((years + 1) * len(assets), alpha=SKETCH_RELATIVE_ERROR)
+        for done in range(0, simulations, batch_size):
+            n = min(batch_size, simulations - done)
+            balances = simulate_paths(allocation, initial_by_asset, annual_contrib_by_asset, years, n, rng, sampler, model)
+            totals = balances.sum(axis=2)
+            count_hits(totals)
+            total_sketch.add(totals)
+            asset_sketch.add(balances.reshape(n, -1))
+        p10, p50, p90 = total_sketch.quantiles([p / 100.0 for p in PERCENTILES])
+        asset_medians = asset_sketch.quantiles([0.5])[0].reshape(years + 1, len(assets))
+        method, rel_error = "sketch", SKETCH_RELATIVE_ERROR
+
+    return monte_carlo_result(
+        assets, p10, p50, p90, asset_medians, simulations, method, rel_error,
+        hit_counts if target_present_value is not None else None, target_present_value
+    )
+
+
+def summarize_unit_paths(
+    allocation: Dict[str, float],
+    unit_paths,
+    investable_balance: float,
+    annual_contribution: float,
+    target_present_value: Optional[float] = None,
+    inflation_rate: float = 0.0
+):
+    """``run_monte_carlo`` output from precomputed per-asset unit paths.
+
+    ``unit_paths`` is ``(G, H)`` from ``simulate_unit_asset_paths`` (or the
+    scenario store); the quantiles are exact over its simulations.
+    """
+    G, H = unit_paths
+    assets = list(allocation.keys())
+    weights = np.array([allocation[a] for a in assets])
+    simulations, n_years = G.shape[0], G.shape[1]
+
+    balances = weights * (investable_balance * G + annual_contribution * H)
+    totals = balances.sum(axis=2)
+    p10, p50, p90 = np.percentile(totals, PERCENTILES, axis=0)
+    asset_medians = np.median(balances, axis=0)
+
+    hit_counts = None
+    if target_present_value is not None:
+        hits = first_hit_years(totals, inflation_rate, target_present_value)
+        hit_counts = np.bincount(np.where(hits < 0, n_years, hits), minlength=n_years + 1)
+    return monte_carlo_result(
+        assets, p10, p50, p90, asset_medians, simulations, "exact", 0.0, hit_counts, target_present_value
+    )
+
+
+def monte_carlo_result(
+    assets: List[str],
+    p10: np.ndarray,
+    p50: np.ndarray,
+    p90: np.ndarray,
+    asset_medians: np.ndarray,
+    simulations: int,
+    method: str,
+    rel_error: float,
+    hit_counts: Optional[np.ndarray] = None,
+    target_present_value: Optional[float] = None
+):
+    years = len(p50) - 1
+    portfolio_percentiles: List[dict] = [
+        {
             "year": y,
-            "p10": round(p10, 2),
-            "p50": round(p50, 2),
-            "p90": round(p90, 2)
-        })
-
-    # per-asset median helper sims
-    helper_sims = max(100, int(simulations * 0.05))
-    per_asset_aggregator = {asset: [[] for _ in range(years + 1)] for asset in allocation.keys()}
-
-    for _ in range(helper_sims):
-        path = simulate_one_path(allocation, initial_by_asset, annual_contrib_by_asset, years)
-        for asset in allocation.keys():
-            for y in range(years + 1):
-                per_asset_aggregator[asset][y].append(path[asset][y])
-
-    per_asset_median_series = {}
-    for asset in allocation.keys():
-        median_series = []
-        for y in range(years + 1):
-            arr = sorted(per_asset_aggregator[asset][y])
-            m = percentile(arr, 50)
-            median_series.append({"year": y, "median": round(m, 2)})
-        per_asset_median_series[asset] = median_series
+            "p10": round(float(p10[y]), 2),
+            "p50": round(float(p50[y]), 2),
+            "p90": round(float(p90[y]), 2)
+        }
+        for y in range(years + 1)
+    ]
 
-    return {
+    per_asset_median_series = {
+        asset: [{"year": y, "median": round(float(asset_medians[y, i]), 2)} for y in range(years + 1)]
+        for i, asset in enumerate(assets)
+    }
+
+    result = {
         "portfolio_percentiles": portfolio_percentiles,
         "per_asset_medians": per_asset_median_series,
-        "simulations_used": simulations
+        "simulations_used": simulations,
+        "quantile_method": method,
+        "quantile_relative_error": rel_error
     }
+    if hit_counts is not None:
+        result["time_to_target"] = time_to_target_summary(hit_counts, simulations, target_present_value)
+    return result
+
+
+def years_to_reach_real_target_batch(
+    initial_investable,
+    annual_contribution,
+    assumed_annual_return,
+    inflation_rate,
+    target_present_value,
+    max_years: int = DEFAULT_MAX_YEARS
+):
+    """Vectorized ``years_to_reach_real_target`` over broadcastable arrays.
+
+    The nominal balance after ``t`` years has the closed form
+    ``B0 * g**t + c * (g**t - 1) / r`` with ``g = 1 + r``, so the real balance
+    for every input and every year is evaluated in one shot; the answer is the
+    first year it reaches the target. The real balance need not be monotone
+    (e.g. inflation above the return), hence the scan over years rather than
+    inverting the formula. Returns ``(years, real_balance)`` arrays with the
+    broadcast shape; ``years`` is -1 where the target is not reached within
+    ``max_years`` and ``real_balance`` is then the balance at ``max_years``.
+    """
+    b0, c, r, inf, target = np.broadcast_arrays(
+        *(np.asarray(v, dtype=float) for v in (
+            initial_investable, annual_contribution, assumed_annual_return, inflation_rate, target_present_value
+        ))
+    )
+    t = np.arange(max_years + 1, dtype=float)
+    r_ = r[..., None]
+    growth = (1.0 + r_) ** t
+    # sum_{k<t} (1+r)^k, which is just t when r == 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annuity = np.where(r_ == 0.0, t, (growth - 1.0) / np.where(r_ == 0.0, 1.0, r_))
+    real = (b0[..., None] * growth + c[..., None] * annuity) / (1.0 + inf[..., None]) ** t
+
+    hit = real >= target[..., None]
+    first = hit.argmax(axis=-1)
+    reached = hit.any(axis=-1)
+    years = np.where(reached, first, -1)
+    real_balance = np.take_along_axis(real, np.where(reached, first, max_years)[..., None], axis=-1)[..., 0]
+    return years, real_balance
 
 
 def years_to_reach_real_target(
@@ -111,14 +374,43 @@ def years_to_reach_real_target(
     target_present_value: float,
     max_years: int = DEFAULT_MAX_YEARS
 ):
-    balance = initial_investable
-    for year in range(0, max_years + 1):
-        denom = (1 + inflation_rate) ** year
-        real_balance = balance / denom
+    years, real_balance = years_to_reach_real_target_batch(
+        initial_investable, annual_contribution, assumed_annual_return,
+        inflation_rate, target_present_value, max_years
+    )
+    return (int(years) if years >= 0 else None), float(real_balance)
+
+
+def first_hit_years(totals: np.ndarray, inflation_rate, target_present_value) -> np.ndarray:
+    """First year each path's real total reaches the target, -1 if never.
+
+    ``totals`` is (..., simulations, years + 1) nominal portfolio value;
+    ``inflation_rate`` and ``target_present_value`` broadcast against the
+    leading axes.
+    """
+    years = np.arange(totals.shape[-1])
+    deflator = (1.0 + np.asarray(inflation_rate, dtype=float)[..., None, None]) ** years
+    hit = totals >= np.asarray(target_present_value, dtype=float)[..., None, None] * deflator
+    return np.where(hit.any(axis=-1), hit.argmax(axis=-1), -1)
 
-        if real_balance >= target_present_value:
-            return year, real_balance
 
-        balance = balance * (1 + assumed_annual_return) + annual_contribution
+def time_to_target_summary(hit_counts: np.ndarray, simulations: int, target_present_value: float):
+    """Summarise a histogram of first-hit years (index = year, last = never)."""
+    n_years = len(hit_counts) - 1
+    cum = np.cumsum(hit_counts[:n_years])
+    probability_by_year = [
+        {"year": y, "probability": round(float(cum[y]) / simulations, 4)} for y in range(n_years)
+    ]
 
-    return None, real_balance
+    def percentile(q):
+        # nearest-rank; None when that share of paths never reaches the target
+        rank = max(1, int(np.ceil(q / 100.0 * simulations)))
+        y = int(np.searchsorted(cum, rank))
+        return y if y < n_years else None
+
+    return {
+        "target_present_value": target_present_value,
+        "probability_reached": round(float(cum[-1]) / simulations, 4),
+        "years_percentiles": {f"p{q}": percentile(q) for q in PERCENTILES},
+        "probability_by_year": probability_by_year
+    }
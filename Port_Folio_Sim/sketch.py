@@ -0,0 +1,69 @@
+# sketch.py
+import math
+from typing import Sequence
+
+import numpy as np
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch for many columns at once (DDSketch-style).
+
+    Non-negative values are counted in logarithmic buckets
+    ``(gamma**(i-1), gamma**i]`` with ``gamma = (1 + alpha) / (1 - alpha)``;
+    values below ``min_value`` (including 0) share one bucket reported as 0.
+
+    Error bound: for any requested quantile the returned value is within a
+    relative error ``alpha`` of ``np.quantile`` on the same samples (linear
+    interpolation between the two order statistics around ``q * (n - 1)``,
+    each read from its bucket; values below ``min_value`` are off by at most ``min_value`` in absolute
+    terms, values above ``max_value`` are clipped to it). Memory is
+    ``n_columns * n_buckets`` counters whatever the number of samples, and two
+    sketches with the same parameters merge by adding counts.
+    """
+
+    def __init__(self, n_columns: int, alpha: float = 0.002, min_value: float = 1.0, max_value: float = 1e12):
+        self.n_columns = n_columns
+        self.alpha = alpha
+        self.min_value = min_value
+        self.gamma = (1.0 + alpha) / (1.0 - alpha)
+        self.log_gamma = math.log(self.gamma)
+        # bucket 0 holds the values below min_value, bucket 1 starts at min_value
+        self.offset = math.floor(math.log(min_value) / self.log_gamma) - 1
+        self.n_buckets = math.ceil(math.log(max_value) / self.log_gamma) - self.offset + 1
+        self.counts = np.zeros((n_columns, self.n_buckets), dtype=np.int64)
+        self.count = 0
+
+    def add(self, values: np.ndarray):
+        """Add a batch of shape (n_samples, n_columns)."""
+        values = np.asarray(values, dtype=float).reshape(-1, self.n_columns)
+        with np.errstate(divide="ignore"):
+            idx = np.ceil(np.log(np.maximum(values, self.min_value)) / self.log_gamma) - self.offset
+        idx = np.clip(idx, 1, self.n_buckets - 1).astype(np.int64)
+        idx[values < self.min_value] = 0
+        idx += np.arange(self.n_columns) * self.n_buckets
+        self.counts += np.bincount(idx.ravel(), minlength=self.counts.size).reshape(self.counts.shape)
+        self.count += values.shape[0]
+
+    def merge(self, other: "QuantileSketch"):
+        self.counts += other.counts
+        self.count += other.count
+
+    def quantiles(self, qs: Sequence[float]) -> np.ndarray:
+        """Quantiles (0..1) per column, shape (len(qs), n_columns)."""
+        cum = np.cumsum(self.counts, axis=1)
+        # bucket midpoint in the relative sense, value 0 for the low bucket
+        i = np.arange(self.n_buckets) + self.offset
+        reps = 2.0 * self.gamma ** i / (self.gamma + 1.0)
+        reps[0] = 0.0
+        out = np.empty((len(qs), self.n_columns))
+        for k, q in enumerate(qs):
+            pos = q * (self.count - 1)
+            lo, hi = math.floor(pos), math.ceil(pos)
+            v_lo = reps[np.minimum((cum <= lo).sum(axis=1), self.n_buckets - 1)]
+            v_hi = reps[np.minimum((cum <= hi).sum(axis=1), self.n_buckets - 1)]
+            out[k] = v_lo + (pos - lo) * (v_hi - v_lo)
+        return out
+
+    @property
+    def nbytes(self) -> int:
+        return self.counts.nbytes
@@ -0,0 +1,33 @@
+# workers.py
+from concurrent.futures.process import BrokenProcessPool
+
+from fastapi import HTTPException
+
+from shared import load_app_module
+
+# the forecast API's bounded pool (app/MS_Pool.py), one implementation for both
+_pool = load_app_module("MS_Pool")
+
+
+class SimulationPool(_pool.SimulationPool):
+    """``app/MS_Pool.py``'s pool with its errors as HTTP responses.
+
+    Over capacity -> HTTP 429, past ``timeout`` or a crashed worker -> 503.
+    A timed-out job still holds its slot until its process finishes it.
+    """
+
+    async def run(self, fn, *args):
+        try:
+            return await super().run(fn, *args)
+        except _pool.PoolSaturated:
+            raise HTTPException(status_code=429, detail="Too many simulations in progress, retry later.",
+                                headers={"Retry-After": "1"})
+        except _pool.PoolTimeout:
+            raise HTTPException(status_code=503, detail="Simulation timed out.")
+        except BrokenProcessPool:
+            raise HTTPException(status_code=503, detail="Simulation worker crashed, retry later.")
+
+
+def run_calls(calls):
+    """Run ``(fn, args)`` pairs one after another in a single pool job."""
+    return [fn(*args) for fn, args in calls]
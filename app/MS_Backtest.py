@@ -0,0 +1,232 @@
+"""Walk-forward backtest of the GBM forecast on the industry index history.
+
+    python -m app.MS_Backtest [--window 60] [--horizons 1 3 5] [--mode exact]
+                              [--n-sims 10000] [--workers 4] [--out backtest.json]
+
+At every month-end origin with ``window`` months of history behind it, the
+GBM is fitted on that window exactly as the API fits it (``fit_gbm``: mean
+and std of monthly log returns, annualised) and the forecast for each
+horizon is compared with the realized index level ``horizon`` years later.
+All origins of one index are forecast in one batched ``summarize_forecast``
+call per horizon, and the indexes are spread over a process pool.
+
+Scores per index and horizon (and pooled over indexes):
+
+* ``brier``: mean squared error of ``prob_gain`` against the realized gain,
+  with ``brier_skill`` relative to always predicting the base rate;
+* ``reliability``: predicted ``prob_gain`` vs observed frequency per decile;
+* ``below_median``: share of outcomes below the forecast median (0.5 when
+  calibrated);
+* ``coverage``: share of outcomes inside the central 50/80/90 % intervals of
+  the fitted log-normal, with the PIT histogram behind it.
+
+Origins a month apart share most of their horizon, so the scores are
+strongly autocorrelated; ``n_independent`` (origins / horizon months) is the
+rough count of non-overlapping outcomes.
+"""
+import argparse
+import json
+import multiprocessing as mp
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+
+from app.MS_FC import all_ind, index_registry, summarize_forecast
+
+
+WINDOW_MONTHS = 60
+HORIZONS = (1, 3, 5)
+# shortest horizon: one month
+MIN_HORIZON_YEARS = 1 / 12
+COVERAGE_LEVELS = (0.5, 0.8, 0.9)
+RELIABILITY_BINS = 10
+
+# (name, last date, months, window) -> (origins, mu_y, sigma_y); fits are
+# shared by every horizon and mode, and by reruns in the same process
+_fit_cache = {}
+
+
+#----------------------------------------------------------------------------------#
+def horizon_months(years):
+    # whole months of a horizon in years; a hair under a month still counts as one
+    return int(round(years * 12, 6))
+
+
+def rolling_fits(prices, window):
+    # Origin t (a price index) is fitted on the log returns of
+    # prices[t - window .. t], the same estimator as fit_gbm, for all t at once.
+    r = np.diff(np.log(np.asarray(prices, dtype=float)))
+    if len(r) < window:
+        return np.empty(0, dtype=int), np.empty(0), np.empty(0)
+    c1 = np.concatenate([[0.0], np.cumsum(r)])
+    c2 = np.concatenate([[0.0], np.cumsum(r * r)])
+    s1 = c1[window:] - c1[:-window]
+    s2 = c2[window:] - c2[:-window]
+    mean = s1 / window
+    var = np.maximum((s2 - window * mean * mean) / (window - 1), 0.0)
+    origins = np.arange(window, len(r) + 1)
+    return origins, mean * 12.0, np.sqrt(var) * np.sqrt(12.0)
+
+
+def cached_fits(st, window):
+    key = (st.name, st.last_date, len(st.prices), window)
+    fits = _fit_cache.get(key)
+    if fits is None:
+        fits = _fit_cache[key] = rolling_fits(st.prices, window)
+    return fits
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+def forecast_index(st, window, horizons, mode, n_sims, seed, sampling):
+    # Per horizon: the arrays every score is computed from, one entry per origin.
+    origins, mu, sigma = cached_fits(st, window)
+    prices = np.asarray(st.prices, dtype=float)
+    rng = np.random.default_rng(seed)
+    out = {}
+    for years in horizons:
+        h = horizon_months(years)
+        keep = origins + h < len(prices)
+        t = origins[keep]
+        if len(t) == 0:
+            continue
+        S0, realized = prices[t], prices[t + h]
+        # forecast over the same whole months the outcome is read at
+        T = h / 12.0
+        median, _, prob_gain = summarize_forecast(S0, mu[keep], sigma[keep], T, n_sims, mode, rng, sampling)
+        m = (mu[keep] - 0.5 * sigma[keep] ** 2) * T
+        s = sigma[keep] * np.sqrt(T)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            z = (np.log(realized / S0) - m) / s
+        out[years] = {
+            "origin": np.asarray(st.dates)[t].astype(str),
+            "prob_gain": np.asarray(prob_gain, dtype=float),
+            "gain": (realized > S0).astype(float),
+            "below_median": (realized < median).astype(float),
+            "z": z,
+        }
+    return st.name, out
+
+
+def score(f, horizon_months):
+    p, y, z = f["prob_gain"], f["gain"], f["z"]
+    base = float(y.mean())
+    brier = float(np.mean((p - y) ** 2))
+    clim = base * (1.0 - base)
+    edges = np.linspace(0.0, 1.0, RELIABILITY_BINS + 1)
+    which = np.clip(np.digitize(p, edges) - 1, 0, RELIABILITY_BINS - 1)
+    reliability = []
+    for b in range(RELIABILITY_BINS):
+        sel = which == b
+        if sel.any():
+            reliability.append({"bin": [float(edges[b]), float(edges[b + 1])], "n": int(sel.sum()),
+                                "predicted": float(p[sel].mean()), "observed": float(y[sel].mean())})
+    pit = np.array([NormalDist().cdf(v) for v in z])
+    return {
+        "n": int(len(p)),
+        "n_independent": max(1, len(p) // horizon_months),
+        "base_rate": base,
+        "mean_prob_gain": float(p.mean()),
+        "brier": brier,
+        "brier_skill": float(1.0 - brier / clim) if clim > 0 else None,
+        "below_median": float(f["below_median"].mean()),
+        "coverage": {
+            f"{int(c * 100)}%": float(np.mean(np.abs(z) <= NormalDist().inv_cdf(0.5 + c / 2.0)))
+            for c in COVERAGE_LEVELS
+        },
+        "pit_histogram": np.histogram(pit, bins=RELIABILITY_BINS, range=(0.0, 1.0))[0].tolist(),
+        "reliability": reliability,
+    }
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+def backtest(indexes=None, window=WINDOW_MONTHS, horizons=HORIZONS, mode="exact", n_sims=10000,
+             seed=0, sampling="plain", workers=1, origins=False):
+    # indexes: name -> IndexStats (default: the registry). workers > 1 runs the
+    # indexes in a spawn process pool; workers=1 stays in this process (the
+    # API's pool workers call it that way). Horizons no index has an outcome
+    # for (longer than the history after the window) are listed in
+    # "skipped_horizons".
+    short = [years for years in horizons if horizon_months(years) < 1]
+    if short:
+        raise ValueError(f"horizons must be at least one month ({MIN_HORIZON_YEARS:.4f} years): {short}")
+    t0 = time.perf_counter()
+    if indexes is None:
+        indexes = index_registry.snapshot()
+    names = [n for n in all_ind if n in indexes] + [n for n in indexes if n not in all_ind]
+    seeds = np.random.SeedSequence(seed).spawn(len(names))
+    jobs = [(indexes[n], window, tuple(horizons), mode, n_sims, s, sampling) for n, s in zip(names, seeds)]
+    if workers > 1:
+        with ProcessPoolExecutor(min(workers, len(jobs)), mp_context=mp.get_context("spawn")) as ex:
+            results = dict(ex.map(forecast_index, *zip(*jobs)))
+    else:
+        results = dict(forecast_index(*job) for job in jobs)
+
+    res = {"window_months": window, "horizons": list(horizons), "mode": mode, "indexes": {}, "pooled": {},
+           "skipped_horizons": []}
+    for years in horizons:
+        h = horizon_months(years)
+        per = {n: results[n][years] for n in names if years in results[n]}
+        for n, f in per.items():
+            entry = score(f, h)
+            if origins:
+                entry["origins"] = {"date": f["origin"].tolist(), "prob_gain": f["prob_gain"].tolist(),
+                                    "gain": f["gain"].astype(int).tolist()}
+            res["indexes"].setdefault(n, {})[f"{years:g}"] = entry
+        if per:
+            pooled = {k: np.concatenate([f[k] for f in per.values()]) for k in ("prob_gain", "gain", "below_median", "z")}
+            res["pooled"][f"{years:g}"] = score(pooled, h)
+        else:
+            res["skipped_horizons"].append(years)
+    res["seconds"] = round(time.perf_counter() - t0, 3)
+    return res
+
+
+def backtest_with_stats(*args):
+    # Pool entry point with the same (res, stats) shape as the forecasts.
+    res = backtest(*args)
+    return res, {"stages": {"backtest": res["seconds"]}}
+#----------------------------------------------------------------------------------#
+
+
+def horizon_arg(value):
+    years = float(value)
+    if horizon_months(years) < 1:
+        raise argparse.ArgumentTypeError(f"horizon must be at least one month ({MIN_HORIZON_YEARS:.4f} years)")
+    return years
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Walk-forward backtest of the industry index forecasts.")
+    parser.add_argument("--window", type=int, default=WINDOW_MONTHS, help="estimation window in months")
+    parser.add_argument("--horizons", type=horizon_arg, nargs="+", default=list(HORIZONS),
+                        help="forecast horizons in years, at least 1/12")
+    parser.add_argument("--mode", choices=("exact", "sampled"), default="exact")
+    parser.add_argument("--n-sims", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--origins", action="store_true", help="include every origin's forecast and outcome")
+    parser.add_argument("--out", help="write JSON results here (default: stdout)")
+    args = parser.parse_args(argv)
+
+    res = backtest(window=args.window, horizons=args.horizons, mode=args.mode, n_sims=args.n_sims,
+                   seed=args.seed, workers=args.workers, origins=args.origins)
+    for years, s in res["pooled"].items():
+        cov = "  ".join(f"{k} {v:.2f}" for k, v in s["coverage"].items())
+        print(f"{years:>4}y  n={s['n']:<5} brier {s['brier']:.3f} (skill {s['brier_skill'] or 0:+.3f})  "
+              f"below median {s['below_median']:.2f}  coverage {cov}", file=sys.stderr)
+    if res["skipped_horizons"]:
+        print(f"skipped (no outcome within the history): {', '.join(f'{y:g}y' for y in res['skipped_horizons'])}",
+              file=sys.stderr)
+    print(f"done in {res['seconds']}s", file=sys.stderr)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(res, f, indent=2)
+    else:
+        print(json.dumps(res, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Rebuild the industry index CSVs in data/stockdata.
+
+    python -m app.MS_Build [--workers 16] [--full] [--industry Technology ...]
+
+Prices come from the local PriceStore, which only downloads the date range
+each ticker is missing, and ticker metadata from the MetaStore table, which
+only refetches rows that are missing, failed or older than a week. By
+default each index is extended in place: only months after its last stored
+month are recomputed and chain-linked onto the existing series. Index
+construction (selection at each rebalance, chain-linking) is in
+``app.MS_Construct``. Besides the CSVs, every index goes into the binary
+bundle ``indexes.msb`` (``app.MS_Bundle``) that the API maps, and a
+``manifest.json`` describing the build is written next to them.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from app.MS_Bundle import BUNDLE_PATH, bundle_from_csvs
+from app.MS_Construct import (COVERAGE_TARGET, REBALANCE_MONTHS, TOP_K, build_index, close_matrix,
+                              month_end_dates, step_matrix)
+from app.MS_Meta import MetaStore, yfinance_shares_history
+from app.MS_Price import PriceStore
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "..", "data")
+STOCKDATA_DIR = os.path.join(DATA_DIR, "stockdata")
+MARKET_LIST_PATH = os.path.join(DATA_DIR, "Market_Stock_List.csv")
+INDUSTRY_ALL_PATH = os.path.join(DATA_DIR, "Industry_all.csv")
+MANIFEST_PATH = os.path.join(STOCKDATA_DIR, "manifest.json")
+
+year_window = 15
+# months a ticker whose refresh failed keeps its last stored close, so a
+# transient fetch error does not drop it from the index (a delisted ticker
+# still leaves once its stored history is this far behind)
+STALE_FILL_MONTHS = 3
+
+
+#----------------------------------------------------------------------------------#
+def load_universe(path=MARKET_LIST_PATH):
+    # industry -> [symbol, ...] from the SET/mai listing.
+    df = pd.read_csv(path, encoding="utf-8-sig")
+    df["Industry"] = df["Industry"].replace("Industrials", "Industrial")
+    return {ind: list(g["Symbol"]) for ind, g in df.groupby("Industry", sort=False)}
+
+
+def fetch_prices(store, symbols, start, end, workers):
+    # Fill the price store for every symbol concurrently; returns {symbol: error}.
+    errors = {}
+
+    def one(symbol):
+        try:
+            store.update(symbol, start, end)
+        except Exception as e:
+            errors[symbol] = repr(e)
+
+    with ThreadPoolExecutor(workers) as ex:
+        list(ex.map(one, symbols))
+    return errors
+
+
+def index_shares(months, symbols, info):
+    # (T, N) shares counted in the index: shares outstanding over time (the
+    # stored history, else today's count) x today's free-float factor.
+    # Tickers with incomplete metadata get 0, i.e. no weight.
+    rows = info.rows(symbols)
+    history = info.shares_history(symbols)
+    now = np.array([(rows.get(s) or {}).get("sharesOutstanding") or 0.0 for s in symbols])
+    float_shares = np.array([(rows.get(s) or {}).get("floatShares") or 0.0 for s in symbols])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        factor = np.clip(np.where(now > 0, float_shares / now, 0.0), 0.0, 1.0)
+    shares = step_matrix(months, [history.get(s) for s in symbols], now)
+    return shares * factor
+
+
+def chain_index(agg, existing=None):
+    # Base-100 index from the aggregate. With an existing series, keep it up to
+    # the second-to-last row (the last one may have been a partial month) and
+    # chain the recomputed months onto it.
+    agg = agg[agg > 0]
+    if existing is not None and len(existing) >= 2:
+        anchor = existing.index[-2]
+        if anchor in agg.index:
+            new = agg[agg.index > anchor] / agg[anchor] * existing["Value"][anchor]
+            out = pd.concat([existing["Value"][existing.index <= anchor], new])
+            return out.to_frame("Value"), len(new)
+    out = (agg / agg.iloc[0]) * 100.0
+    return out.to_frame("Value"), len(out)
+
+
+def write_csv_atomic(df, path, **kwargs):
+    tmp = path + ".tmp"
+    df.to_csv(tmp, **kwargs)
+    os.replace(tmp, path)
+
+
+def write_json_atomic(obj, path):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(obj, f, indent=2, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
+
+
+def write_industry_all(members, path=INDUSTRY_ALL_PATH):
+    # Same layout as the notebook output: Industry,Symbol,,, ...
+    width = max([len(v) for v in members.values()] + [1])
+    rows = [[ind] + v + [""] * (width - len(v)) for ind, v in members.items()]
+    df = pd.DataFrame(rows, columns=["Industry", "Symbol"] + [""] * (width - 1))
+    write_csv_atomic(df, path, index=False)
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+def build(store=None, info=None, industries=None, full=False, workers=16,
+          out_dir=STOCKDATA_DIR, universe_path=MARKET_LIST_PATH, today=None, refresh_meta=False,
+          top_k=TOP_K, coverage=COVERAGE_TARGET, rebalance_months=REBALANCE_MONTHS):
+    t0 = time.perf_counter()
+    store = store or PriceStore()
+    info = info or MetaStore(history_fetcher=yfinance_shares_history)
+    today = today or datetime.today()
+    start = f"{today.year - year_window}-01-01"
+    end = today.strftime("%Y-%m-%d")
+
+    universe = load_universe(universe_path)
+    all_industries = list(universe)
+    if industries:
+        universe = {k: v for k, v in universe.items() if k in industries}
+    tickers = sorted({s + ".BK" for v in universe.values() for s in v})
+
+    fetch_errors = fetch_prices(store, tickers, start, end, workers)
+
+    # one price matrix for the whole universe; columns follow `tickers`
+    months, prices = close_matrix(store, tickers, start, end)
+    column = {t: i for i, t in enumerate(tickers)}
+    # a failed refresh still has the stored prices: carry the last close
+    # forward so the ticker keeps its place until the next successful fetch
+    stale = [column[t] for t in fetch_errors if t in column]
+    if stale:
+        prices[:, stale] = pd.DataFrame(prices[:, stale]).ffill(limit=STALE_FILL_MONTHS).to_numpy()
+    has_prices = (~np.isnan(prices)).sum(axis=0) >= 2
+    listed = [t for t, ok in zip(tickers, has_prices) if ok]
+    members = {ind: [s for s in symbols if s + ".BK" in listed] for ind, symbols in universe.items()}
+
+    info_errors = info.refresh(listed, workers, force=refresh_meta)
+    excluded = info.incomplete(listed)
+    shares = index_shares(months, tickers, info)
+    dates = pd.DatetimeIndex(month_end_dates(months), name="Date")
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        "start": start,
+        "end": end,
+        "mode": "full" if full else "incremental",
+        "indexes": {},
+        "excluded": excluded,
+        "fetch_errors": fetch_errors,
+        "info_errors": info_errors,
+    }
+    weighted = {s: column[s + ".BK"] for v in members.values() for s in v if s not in set(excluded)}
+    for ind, symbols in members.items():
+        selected = np.asarray([s for s in symbols if s in weighted])
+        cols = [weighted[s] for s in selected]
+        levels, held = build_index(months, prices[:, cols], shares[:, cols], top_k, coverage, rebalance_months)
+        agg = pd.Series(levels, index=dates).dropna()
+        if agg.empty:
+            continue
+        path = os.path.join(out_dir, str(ind) + ".csv")
+        existing = None
+        if not full and os.path.exists(path):
+            existing = pd.read_csv(path, index_col=0, parse_dates=True)
+        df, appended = chain_index(agg, existing)
+        df.index.name = "Date"
+        write_csv_atomic(df, path, index=True, date_format="%Y-%m-%d")
+        manifest["indexes"][ind] = {
+            "file": os.path.basename(path),
+            "rows": len(df),
+            "first_date": str(df.index[0])[:10],
+            "last_date": str(df.index[-1])[:10],
+            "rows_written": appended,
+            "constituents": selected[held[-1]].tolist(),
+            "ever_selected": int(held.any(axis=0).sum()),
+        }
+
+    if not industries:
+        write_industry_all(members)
+    # every index, rebuilt or not, goes into the bundle the API maps
+    built = [ind for ind in all_industries if os.path.exists(os.path.join(out_dir, str(ind) + ".csv"))]
+    bundle = bundle_from_csvs(built, out_dir, os.path.join(out_dir, os.path.basename(BUNDLE_PATH)),
+                              source="MS_Build", mode=manifest["mode"])
+    manifest["bundle"] = {"file": os.path.basename(BUNDLE_PATH), "build_id": bundle["build_id"]}
+    manifest["duration_s"] = round(time.perf_counter() - t0, 3)
+    write_json_atomic(manifest, os.path.join(out_dir, os.path.basename(MANIFEST_PATH)))
+    return manifest
+#----------------------------------------------------------------------------------#
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild the SET industry index CSVs.")
+    parser.add_argument("--workers", type=int, default=16, help="concurrent fetches")
+    parser.add_argument("--full", action="store_true", help="recompute every index from its base month")
+    parser.add_argument("--industry", action="append", help="only rebuild this industry (repeatable)")
+    parser.add_argument("--refresh-meta", action="store_true", help="refetch metadata for every ticker, however recent")
+    parser.add_argument("--top-k", type=int, default=TOP_K, help="most constituents per index")
+    parser.add_argument("--coverage", type=float, default=COVERAGE_TARGET,
+                        help="free-float market-cap share the constituents should reach")
+    parser.add_argument("--rebalance-months", type=int, default=REBALANCE_MONTHS)
+    args = parser.parse_args(argv)
+
+    manifest = build(industries=args.industry, full=args.full, workers=args.workers, refresh_meta=args.refresh_meta,
+                     top_k=args.top_k, coverage=args.coverage, rebalance_months=args.rebalance_months)
+    for ind, m in manifest["indexes"].items():
+        print(f"{ind:<26} {m['last_date']}  +{m['rows_written']} rows  {len(m['constituents'])} tickers")
+    print(f"excluded: {manifest['excluded']}")
+    print(f"done in {manifest['duration_s']}s")
+
+
+if __name__ == "__main__":
+    main()
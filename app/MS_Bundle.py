@@ -0,0 +1,140 @@
+"""Single-file binary bundle of the industry index series.
+
+    python -m app.MS_Bundle            # (re)write the bundle from the CSVs
+
+Layout (little-endian)::
+
+    b"MSIDX\\0\\0\\0"  magic
+    uint32           format version (BUNDLE_FORMAT)
+    uint32           header length in bytes
+    header           UTF-8 JSON: names, n_months, offsets, built_at, build_id, ...
+    padding          to a 64-byte boundary
+    int64[n_months]  month-end dates, days since 1970-01-01
+    float64[n, m]    index levels, one row per name, NaN before an index starts
+
+``read_bundle`` maps the file and returns views into it, so loading every
+index history is one ``mmap`` with no parsing beyond the small header. The
+writer goes through a temporary file and ``os.replace``, so a reader sees
+either the old bundle or the new one.
+"""
+import hashlib
+import json
+import mmap
+import os
+import struct
+from datetime import datetime
+from typing import NamedTuple
+
+import numpy as np
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STOCKDATA_DIR = os.path.join(BASE_DIR, "..", "data", "stockdata")
+BUNDLE_PATH = os.path.join(STOCKDATA_DIR, "indexes.msb")
+BUNDLE_MAGIC = b"MSIDX\0\0\0"
+BUNDLE_FORMAT = 1
+ALIGN = 64
+
+
+class Bundle(NamedTuple):
+    header: dict
+    names: list
+    dates: np.ndarray   # datetime64[D], shape (m,)
+    values: np.ndarray  # float64, shape (n, m), read-only view of the file
+
+    def series(self, name):
+        # (dates, levels) of one index without its leading NaNs; both are views.
+        row = self.values[self.names.index(name)]
+        valid = ~np.isnan(row)
+        if not valid.any():
+            return self.dates[:0], row[:0]
+        first = int(np.argmax(valid))
+        return self.dates[first:], row[first:]
+
+
+#----------------------------------------------------------------------------------#
+def _pad(n):
+    return -n % ALIGN
+
+
+def write_bundle(names, dates, values, path=BUNDLE_PATH, **meta):
+    # names: n index names; dates: m month-ends; values: (n, m) levels.
+    dates = np.asarray(dates, dtype="M8[D]").astype("<i8")
+    values = np.ascontiguousarray(values, dtype="<f8")
+    if values.shape != (len(names), len(dates)):
+        raise ValueError(f"values shape {values.shape} does not match {len(names)} names x {len(dates)} dates")
+
+    header = {
+        "names": list(names),
+        "n_months": int(len(dates)),
+        "built_at": datetime.now().isoformat(timespec="seconds"),
+        "build_id": hashlib.sha1(dates.tobytes() + values.tobytes() + "\0".join(names).encode()).hexdigest()[:16],
+        **meta,
+    }
+    prefix = len(BUNDLE_MAGIC) + 8
+    # offsets depend on the header length, which depends on the offsets' digits
+    header["dates_offset"] = header["values_offset"] = 0
+    while True:
+        blob = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        start = prefix + len(blob)
+        if header["dates_offset"] >= start:
+            break
+        header["dates_offset"] = start + _pad(start)
+        header["values_offset"] = header["dates_offset"] + dates.nbytes + _pad(dates.nbytes)
+
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(BUNDLE_MAGIC + struct.pack("<II", BUNDLE_FORMAT, len(blob)) + blob)
+        f.write(b"\0" * (header["dates_offset"] - f.tell()))
+        f.write(dates.tobytes())
+        f.write(b"\0" * (header["values_offset"] - f.tell()))
+        f.write(values.tobytes())
+    os.replace(tmp, path)
+    return header
+
+
+def read_bundle(path=BUNDLE_PATH):
+    with open(path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    prefix = len(BUNDLE_MAGIC) + 8
+    if buf[:len(BUNDLE_MAGIC)] != BUNDLE_MAGIC:
+        raise ValueError(f"{path} is not an index bundle")
+    fmt, header_len = struct.unpack("<II", buf[len(BUNDLE_MAGIC):prefix])
+    if fmt != BUNDLE_FORMAT:
+        raise ValueError(f"{path}: bundle format {fmt}, expected {BUNDLE_FORMAT}")
+    header = json.loads(bytes(buf[prefix:prefix + header_len]).decode("utf-8"))
+    n, m = len(header["names"]), header["n_months"]
+    dates = np.frombuffer(buf, dtype="<i8", count=m, offset=header["dates_offset"]).view("M8[D]")
+    values = np.frombuffer(buf, dtype="<f8", count=n * m, offset=header["values_offset"]).reshape(n, m)
+    return Bundle(header, header["names"], dates, values)
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+def align_series(series):
+    # {name: (dates, levels)} -> (names, union of dates, (n, m) levels with NaN gaps)
+    names = list(series)
+    dates = np.unique(np.concatenate([np.asarray(d, dtype="M8[D]") for d, _ in series.values()]))
+    values = np.full((len(names), len(dates)), np.nan)
+    for i, (d, v) in enumerate(series.values()):
+        values[i, np.searchsorted(dates, np.asarray(d, dtype="M8[D]"))] = v
+    return names, dates, values
+
+
+def bundle_from_csvs(names, data_dir=STOCKDATA_DIR, path=BUNDLE_PATH, **meta):
+    import pandas as pd
+    series = {}
+    for name in names:
+        df = pd.read_csv(os.path.join(data_dir, str(name) + ".csv"), index_col=0, parse_dates=True)
+        series[name] = (df.index.values.astype("M8[D]"), df.iloc[:, 0].to_numpy(dtype=float))
+    return write_bundle(*align_series(series), path=path, **{"source": "csv", **meta})
+#----------------------------------------------------------------------------------#
+
+
+def main():
+    from app.MS_FC import all_ind
+    header = bundle_from_csvs(all_ind)
+    print(f"{BUNDLE_PATH}: {len(header['names'])} indexes x {header['n_months']} months, build {header['build_id']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Free-float market-cap index construction on dates x tickers matrices.
+
+Every step works on whole arrays: one monthly close matrix for the whole
+universe, one matrix of index shares (shares outstanding x free-float
+factor, time-varying where a share history is stored), a rolling-mean
+smoothed free-float market cap, and constituent selection at all rebalance
+dates in one vectorized pass (``select_top_k_by_coverage`` from the
+notebook, for every date at once). Levels are chain-linked month to month
+over the constituents held during the month, with the share counts of the
+previous month-end, so neither a rebalance nor a share-count change moves
+the index.
+"""
+import numpy as np
+
+
+TOP_K = 10
+COVERAGE_TARGET = 0.95
+REBALANCE_MONTHS = 6
+SMOOTH_MONTHS = 3
+
+
+#----------------------------------------------------------------------------------#
+def month_axis(start, end):
+    # Calendar months covering [start, end] as datetime64[M].
+    return np.arange(np.datetime64(start[:7], "M"), np.datetime64(end[:7], "M") + 1)
+
+
+def month_end_dates(months):
+    # datetime64[M] -> last calendar day, the labels resample("ME") gives.
+    return (months + 1).astype("M8[D]") - np.timedelta64(1, "D")
+
+
+def _ffill_inside(a):
+    # Forward-fill NaN gaps within each column's listed life (first to last
+    # observation); a suspended month keeps its last close, nothing is
+    # carried past delisting.
+    valid = ~np.isnan(a)
+    rows = np.arange(a.shape[0])[:, None]
+    last_seen = np.maximum.accumulate(np.where(valid, rows, -1), axis=0)
+    out = np.take_along_axis(a, np.maximum(last_seen, 0), axis=0)
+    last_obs = np.where(valid.any(axis=0), a.shape[0] - 1 - np.argmax(valid[::-1], axis=0), -1)
+    out[(last_seen < 0) | (rows > last_obs)] = np.nan
+    return out
+
+
+def close_matrix(store, symbols, start, end):
+    # (months, prices) with prices[t, i] the last close of symbols[i] in
+    # months[t], read from the PriceStore without refreshing it.
+    months = month_axis(start, end)
+    prices = np.full((len(months), len(symbols)), np.nan)
+    for i, symbol in enumerate(symbols):
+        rows = store.get(symbol, start, end, refresh=False)
+        rows = rows[~np.isnan(rows["Close"])]
+        if len(rows) == 0:
+            continue
+        m = rows["Date"].astype("M8[M]")
+        # last trading day of each month: where the month changes going forward
+        last = np.r_[m[1:] != m[:-1], True]
+        prices[(m[last] - months[0]).astype(int), i] = rows["Close"][last]
+    return months, _ffill_inside(prices)
+
+
+def step_matrix(months, series, default):
+    # Piecewise-constant (T, N) matrix: column i holds the latest value of
+    # series[i] = (dates, values) at or before each month-end, its earliest
+    # value before that, and default[i] when there is no series.
+    ends = month_end_dates(months)
+    out = np.tile(np.asarray(default, dtype=float), (len(months), 1))
+    for i, s in enumerate(series):
+        if s is None or len(s[0]) == 0:
+            continue
+        dates, values = s
+        order = np.argsort(dates)
+        dates, values = dates[order], values[order]
+        j = np.searchsorted(dates, ends, side="right") - 1
+        out[:, i] = values[np.maximum(j, 0)]
+    return out
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+def smoothed_ffmc(prices, index_shares, window=SMOOTH_MONTHS):
+    # Trailing mean over `window` months of price x index shares, ignoring
+    # months a ticker has no price (min_periods=1, as in the notebook).
+    ffmc = prices * index_shares
+    valid = ~np.isnan(ffmc)
+    csum = np.cumsum(np.where(valid, ffmc, 0.0), axis=0)
+    ccount = np.cumsum(valid, axis=0)
+    csum[window:] = csum[window:] - csum[:-window]
+    ccount[window:] = ccount[window:] - ccount[:-window]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = csum / ccount
+    out[~valid] = np.nan
+    return out
+
+
+def rebalance_rows(months, every=REBALANCE_MONTHS):
+    # First row plus every month that starts a period of `every` months
+    # (January and July for 6).
+    month_of_year = months.astype(int) % 12
+    rows = np.flatnonzero(month_of_year % every == 0)
+    return np.union1d([0], rows)
+
+
+def select_top_k(ffmc, top_k=TOP_K, coverage=COVERAGE_TARGET):
+    # Boolean (R, N): for each row, the largest tickers by ffmc until their
+    # cumulative weight reaches `coverage`, at most top_k of them.
+    filled = np.where(np.isnan(ffmc) | (ffmc <= 0), 0.0, ffmc)
+    n_valid = (filled > 0).sum(axis=1)
+    order = np.argsort(-filled, axis=1, kind="stable")
+    ranked = np.take_along_axis(filled, order, axis=1)
+    total = ranked.sum(axis=1, keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cum = np.cumsum(ranked, axis=1) / total
+    # smallest n reaching the target, then capped
+    n = (cum < coverage - 1e-12).sum(axis=1) + 1
+    n = np.minimum(np.minimum(n, n_valid), top_k)
+    chosen = np.arange(filled.shape[1]) < n[:, None]
+    out = np.zeros_like(chosen)
+    np.put_along_axis(out, order, chosen, axis=1)
+    return out
+
+
+def hold_members(n_rows, rows, selected):
+    # Each rebalance selection held until the next rebalance: (T, N).
+    which = np.searchsorted(rows, np.arange(n_rows), side="right") - 1
+    return selected[which]
+
+
+def chain_levels(prices, index_shares, members, base=100.0):
+    # Month t's return is sum(P_t q_{t-1}) / sum(P_{t-1} q_{t-1}) over the
+    # constituents held at t-1 with a price at both ends. NaN before the
+    # first month with constituents.
+    q = np.where(members[:-1], index_shares[:-1], 0.0)
+    ok = ~np.isnan(prices[1:]) & ~np.isnan(prices[:-1]) & (q > 0)
+    num = np.where(ok, prices[1:] * q, 0.0).sum(axis=1)
+    den = np.where(ok, prices[:-1] * q, 0.0).sum(axis=1)
+    growth = np.where(den > 0, num / np.where(den > 0, den, 1.0), 1.0)
+
+    has = (np.where(members, index_shares, 0.0) * np.nan_to_num(prices) > 0).any(axis=1)
+    levels = np.full(len(prices), np.nan)
+    if not has.any():
+        return levels
+    first = int(np.argmax(has))
+    levels[first] = base
+    levels[first + 1:] = base * np.cumprod(growth[first:])
+    return levels
+#----------------------------------------------------------------------------------#
+
+
+def build_index(months, prices, index_shares, top_k=TOP_K, coverage=COVERAGE_TARGET,
+                rebalance_months=REBALANCE_MONTHS, smooth_months=SMOOTH_MONTHS):
+    # (levels (T,), members (T, N)) for one index over the given columns.
+    smoothed = smoothed_ffmc(prices, index_shares, smooth_months)
+    rows = rebalance_rows(months, rebalance_months)
+    members = hold_members(len(months), rows, select_top_k(smoothed[rows], top_k, coverage))
+    return chain_levels(prices, index_shares, members), members
@@ -1,21 +1,24 @@
 import numpy as np
-import pandas as pd
-import yfinance as yf
 from datetime import datetime
-from pprint import pprint
+from math import erf
 import os
+import time
 import warnings
 
+from app.MS_Cache import ResultCache
+from app.MS_Fan import FAN_MAX_SIMS, fan_bands
+from app.MS_Index import IndexRegistry, fit_gbm
+from app.MS_Metrics import StageTimer
+from app.MS_Models import RETURN_MODELS, has_history, make_model
+from app.MS_Sampling import SAMPLING_METHODS, NormalSampler
+from app.MS_Symbols import SymbolIndex
+from app.MS_Price import PriceStore
+
 warnings.simplefilter(action='ignore', category=FutureWarning)
 
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-csv_path = os.path.join(BASE_DIR, "..", "data", "Industry_sorted_10.csv")
-df_tk = pd.read_csv(csv_path, dtype=str)
-cant_cal = ['S&J', 'WELL', 'S&J', 'WELL', 'ACAP', 'GSTEEL', 'MIPF', 'MNIT', 'QHBREIT', 'QHOP', 'TAPAC', 'TIF1', 'TU-PF', 'SGP', 'MANRIN']
 cut_ind = ['Property & Construction','Agro & Food Industry','Technology']
 all_ind = ['Industrial', 'Technology', 'Consumer Products', 'Property & Construction', 'Agro & Food Industry', 'Services', 'Resources', 'Financials']
-fail = []
 
 name_ind = {
     "Industrial" : "สินค้าอุตสาหกรรม",
@@ -40,103 +43,447 @@ call_ind = {
 }
 
 year_window = 15
+price_store = PriceStore()
+index_registry = IndexRegistry(all_ind)
+forecast_cache = ResultCache(
+    maxsize=int(os.environ.get("MS_CACHE_SIZE", 64)),
+    ttl=float(os.environ.get("MS_CACHE_TTL", 3600)),
+)
+# symbol -> sector -> fitted monthly returns, read from the price store only
+symbol_index = SymbolIndex(price_store, year_window)
+# a rebuilt index set makes every cached forecast stale
+index_registry.on_reload(forecast_cache.invalidate)
+
+# sampled: Monte Carlo on terminal prices, exact: closed-form GBM summary,
+# adaptive: Monte Carlo in growing batches until a target standard error
+FORECAST_MODES = ("sampled", "exact", "adaptive")
+# paths per vectorized block in the sampled engine, bounds the exp() temporaries
+CHUNK_SIMS = 65536
+
+# Request limits. MAX_SIMS caps n_sims (and the adaptive engine); the memory
+# budget caps the (n_sims x indexes) log-return buffer; adaptive runs also stop
+# after ADAPTIVE_MAX_SECONDS of simulation.
+MAX_SIMS = int(os.environ.get("MS_MAX_SIMS", 1_000_000))
+MAX_YEARS = int(os.environ.get("MS_MAX_YEARS", 50))
+SIM_MEMORY_MB = float(os.environ.get("MS_SIM_MEMORY_MB", 256))
+ADAPTIVE_MAX_SECONDS = float(os.environ.get("MS_ADAPTIVE_MAX_SECONDS", 5.0))
+ADAPTIVE_BATCH_SIMS = 10000
 
 #----------------------------------------------------------------------------------#
-def monte_carlo_gbm_monthly(S0, mu_y, sigma_y, years, n_sims=10000):
+def monte_carlo_gbm_monthly(S0, mu_y, sigma_y, years, n_sims=10000, sampling="plain", rng=None):
+    rng = np.random.default_rng() if rng is None else rng
     months = int(years * 12)
     dt = 1.0 / 12.0
     prices = np.zeros((months + 1, n_sims))
     prices[0, :] = S0
     mu_m = mu_y * dt
     sigma_m = sigma_y * np.sqrt(dt)
+    # non-plain samplers draw all (path, month) normals up front, one dimension per month
+    z_all = None if sampling == "plain" else NormalSampler(months, sampling, rng).draw(n_sims)
     for t in range(1, months + 1):
-        z = np.random.normal(size=n_sims)
+        z = rng.standard_normal(n_sims) if z_all is None else z_all[:, t - 1]
         prices[t, :] = prices[t-1, :] * np.exp((mu_m - 0.5 * sigma_m**2) + sigma_m * z)
     return prices
 #----------------------------------------------------------------------------------#
 
 #----------------------------------------------------------------------------------#
-def forecast_stock_prices(years_forecast, n_sims=10000):
+def simulate_terminal_batch(S0, mu_y, sigma_y, years, n_sims=10000, rng=None, chunk_size=CHUNK_SIMS, sampling="plain",
+                            model=None):
+    # Terminal-price summaries for k indexes at once; S0 / mu_y / sigma_y are
+    # length-k vectors. The sum of the monthly log-normal steps is itself normal,
+    # so one draw per (path, index) replaces the monthly loop. Only the (n_sims, k)
+    # log-returns are kept (for the median); exp() temporaries are chunked.
+    # sampling picks the normal sampler (see MS_Sampling), one dimension per index;
+    # model (MS_Models) turns its normals into the return model's terminal shocks.
+    rng = np.random.default_rng() if rng is None else rng
+    S0, mu_y, sigma_y = (np.atleast_1d(np.asarray(v, dtype=float)) for v in (S0, mu_y, sigma_y))
+    sampler = NormalSampler(len(S0), sampling, rng)
+    T = int(years * 12) / 12.0
+    drift = (mu_y - 0.5 * sigma_y**2) * T
+    vol = sigma_y * np.sqrt(T)
+
+    log_ret = np.empty((n_sims, len(S0)))
+    growth_sum = np.zeros(len(S0))
+    gains = np.zeros(len(S0))
+    for lo in range(0, n_sims, chunk_size):
+        hi = min(lo + chunk_size, n_sims)
+        block = log_ret[lo:hi]
+        sampler.draw(hi - lo, out=block)
+        if model is not None:
+            model.terminal(block)
+        block *= vol
+        block += drift
+        growth_sum += np.exp(block).sum(axis=0)
+        gains += (block >= 0).sum(axis=0)
+
+    median = S0 * np.exp(np.median(log_ret, axis=0))
+    mean = S0 * growth_sum / n_sims
+    prob_gain = gains / n_sims
+    return median, mean, prob_gain
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+def sim_budget(k):
+    # Most paths a request may simulate for k indexes (count and memory caps).
+    return int(min(MAX_SIMS, SIM_MEMORY_MB * 2**20 // (8 * max(k, 1))))
+
+
+def median_se(x):
+    # Distribution-free standard error of each column's sample median from the
+    # order-statistic 95% interval: ranks n/2 +- 1.96 * sqrt(n)/2, spread / (2 * 1.96).
+    n = len(x)
+    half = 1.96 * np.sqrt(n) / 2.0
+    lo = max(int(np.floor(n / 2.0 - half)), 0)
+    hi = min(int(np.ceil(n / 2.0 + half)), n - 1)
+    part = np.partition(x, [lo, hi], axis=0)
+    return (part[hi] - part[lo]) / (2.0 * 1.96)
+
+
+def simulate_terminal_adaptive(S0, mu_y, sigma_y, years, target_se, rng=None,
+                               batch=ADAPTIVE_BATCH_SIMS, max_sims=None, max_seconds=ADAPTIVE_MAX_SECONDS,
+                               sampling="plain", model=None):
+    # Like simulate_terminal_batch, but adds paths until every index has a
+    # relative standard error of the median and a standard error of prob_gain
+    # <= target_se, or the sim / time budget runs out. The median of S_T is
+    # S0 * exp(median log-return), so the log-return median's SE is its
+    # relative SE. Returns (median, mean, prob_gain, precision).
+    rng = np.random.default_rng() if rng is None else rng
+    S0, mu_y, sigma_y = (np.atleast_1d(np.asarray(v, dtype=float)) for v in (S0, mu_y, sigma_y))
+    k = len(S0)
+    sampler = NormalSampler(k, sampling, rng)
+    max_sims = sim_budget(k) if max_sims is None else max_sims
+    T = int(years * 12) / 12.0
+    drift = (mu_y - 0.5 * sigma_y**2) * T
+    vol = sigma_y * np.sqrt(T)
+
+    # pages are only touched as batches are written
+    log_ret = np.empty((max_sims, k))
+    growth_sum = np.zeros(k)
+    gains = np.zeros(k)
+    n = 0
+    t0 = time.perf_counter()
+    while True:
+        hi = min(n + batch, max_sims)
+        for lo in range(n, hi, CHUNK_SIMS):
+            block = log_ret[lo:min(lo + CHUNK_SIMS, hi)]
+            sampler.draw(len(block), out=block)
+            if model is not None:
+                model.terminal(block)
+            block *= vol
+            block += drift
+            growth_sum += np.exp(block).sum(axis=0)
+            gains += (block >= 0).sum(axis=0)
+        n = hi
+
+        se_median = median_se(log_ret[:n])
+        p = gains / n
+        se_prob = np.sqrt(p * (1.0 - p) / n)
+        worst = max(se_median.max(), se_prob.max())
+        if worst <= target_se:
+            reason = "converged"
+            break
+        if n >= max_sims:
+            reason = "sim_budget"
+            break
+        if time.perf_counter() - t0 >= max_seconds:
+            reason = "time_budget"
+            break
+        # SE ~ 1/sqrt(n): jump close to the size that should be enough
+        needed = int(np.ceil(n * (worst / target_se) ** 2 * 1.05))
+        batch = max(batch, needed - n)
+
+    median = S0 * np.exp(np.median(log_ret[:n], axis=0))
+    mean = S0 * growth_sum / n
+    precision = {
+        "target_se": target_se,
+        "sims_used": n,
+        "sim_budget": max_sims,
+        "stop_reason": reason,
+        "converged": reason == "converged",
+        "se_median_rel": se_median,
+        "se_prob_gain": se_prob,
+    }
+    return median, mean, p, precision
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+def gbm_terminal_summary(S0, mu_y, sigma_y, years):
+    # Exact median / mean / prob_gain of the GBM terminal price, no sampling.
+    S0, mu_y, sigma_y = (np.atleast_1d(np.asarray(v, dtype=float)) for v in (S0, mu_y, sigma_y))
+    T = int(years * 12) / 12.0
+    m = (mu_y - 0.5 * sigma_y**2) * T
+    s = sigma_y * np.sqrt(T)
+    median = S0 * np.exp(m)
+    mean = S0 * np.exp(mu_y * T)
+    prob_gain = np.where(m >= 0, 1.0, 0.0)
+    ok = s > 0
+    prob_gain[ok] = [0.5 * (1.0 + erf(x)) for x in m[ok] / (s[ok] * np.sqrt(2.0))]
+    return median, mean, prob_gain
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+def summarize_forecast(S0, mu_y, sigma_y, years, n_sims, mode="sampled", rng=None, sampling="plain", model=None):
+    # Vectors in, one (median, mean, prob_gain) vector each out.
+    if mode == "exact":
+        return gbm_terminal_summary(S0, mu_y, sigma_y, years)
+    return simulate_terminal_batch(S0, mu_y, sigma_y, years, n_sims=n_sims, rng=rng, sampling=sampling, model=model)
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+def check_request(years_forecast, n_sims, mode, target_se, sampling, k, return_model="gbm"):
+    # Error message for an unusable request over k series, else None.
     if years_forecast <= 0:
-        return {"Error": "Years forecast must be greater than 0."}
-    
+        return "Years forecast must be greater than 0."
+    if mode not in FORECAST_MODES:
+        return f"Mode must be one of {', '.join(FORECAST_MODES)}."
+    if years_forecast > MAX_YEARS:
+        return f"Years forecast must be at most {MAX_YEARS}."
+    if mode == "sampled" and not 0 < n_sims <= sim_budget(k):
+        return f"n_sims must be between 1 and {sim_budget(k)}."
+    if mode == "adaptive" and not target_se > 0:
+        return "target_se must be greater than 0."
+    if sampling not in SAMPLING_METHODS:
+        return f"Sampling must be one of {', '.join(SAMPLING_METHODS)}."
+    if return_model not in RETURN_MODELS:
+        return f"Return model must be one of {', '.join(RETURN_MODELS)}."
+    if mode == "exact" and return_model != "gbm":
+        return "The exact mode only supports the gbm return model."
+    return None
+
+
+def return_model_for(return_model, years_forecast, rng, histories):
+    # MS_Models engine for the horizon, None for plain GBM. histories: each
+    # series' monthly log returns, only read by the bootstrap.
+    if return_model == "gbm":
+        return None
+    return make_model(return_model, int(years_forecast * 12), rng, histories)
+
+
+def split_history(entries, return_model):
+    # (entries the return model can run on, symbols with too short a history
+    # for it); the bootstrap needs a few monthly returns, gbm none.
+    if return_model not in RETURN_MODELS:
+        return list(entries), []
+    usable = [e for e in entries if has_history(return_model, e.log_returns)]
+    return usable, [e.symbol for e in entries if not has_history(return_model, e.log_returns)]
+
+
+def simulate_rows(keys, S0s, mus, sigmas, years_forecast, n_sims, mode, rng, target_se, sampling,
+                  model=None):
+    # One batched run over every series; precision is the adaptive report
+    # (None for the other modes).
+    if mode != "adaptive":
+        medians, means, prob_gains = summarize_forecast(
+            S0s, mus, sigmas, years_forecast, n_sims, mode, rng, sampling, model)
+        return medians, means, prob_gains, None
+    medians, means, prob_gains, precision = simulate_terminal_adaptive(
+        S0s, mus, sigmas, years_forecast, target_se, rng, sampling=sampling, model=model)
+    report = {
+        **{k: v for k, v in precision.items() if not k.startswith("se_")},
+        "se_median_rel": float(precision["se_median_rel"].max()),
+        "se_prob_gain": float(precision["se_prob_gain"].max()),
+        "per_index": {
+            key: {"se_median_rel": float(a), "se_prob_gain": float(b)}
+            for key, a, b in zip(keys, precision["se_median_rel"], precision["se_prob_gain"])
+        },
+    }
+    return medians, means, prob_gains, report
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+def forecast_stock_prices(years_forecast, n_sims=10000, mode="sampled", seed=None, indexes=None,
+                          target_se=0.005, sampling="plain", fan_quantiles=None, return_model="gbm", stats=None):
+    # indexes: name -> IndexStats snapshot; None reads the local registry.
+    # target_se: precision goal of the adaptive mode (n_sims is then ignored).
+    # sampling: normal sampler of the Monte Carlo modes (MS_Sampling).
+    # fan_quantiles: also return monthly quantile bands (MS_Fan) at these levels.
+    # return_model: distribution of the monthly returns (MS_Models).
+    # stats: optional dict, filled with stage timings, failed indexes and
+    # symbols whose price fetch failed (see forecast_with_stats).
+    error = check_request(years_forecast, n_sims, mode, target_se, sampling, len(all_ind) + 1, return_model)
+    if error:
+        return {"Error": error}
+
     yst = datetime.now().year - year_window
     start = f"{str(yst)}-01-01"
     end = datetime.today().strftime('%Y-%m-%d')
+    rng = np.random.default_rng(seed)
 
     res = {}
     res["Last_Time_for_index"] = None
     res["Last_Time_for_SET"] = None
     res["SET"] = None
-    ch = 1
-    try:
-        df_daily = yf.download("^SET.BK", start=start, end=end, interval="1d", auto_adjust=False, progress=False)
-    except:
-        ch = 0
-    if (ch and len(df_daily) >= 2):
-        price_daily = df_daily["Close"].copy()
-        price_daily = price_daily.dropna()
-        price_daily.index = pd.to_datetime(price_daily.index)
-        price_monthly = price_daily.resample('ME').last().dropna()
-        log_returns_monthly = np.log(price_monthly / price_monthly.shift(1)).dropna()
-        mu_y = float(log_returns_monthly.mean()) * 12.0
-        sigma_y = float(log_returns_monthly.std(ddof=1)) * np.sqrt(12.0)
-        S0 = price_monthly.iloc[-1]
-        paths = monte_carlo_gbm_monthly(S0, mu_y, sigma_y, years_forecast, n_sims=n_sims)
-        S0 = float(S0)
-        last_price = paths[-1, :]
-
-        median = np.median(last_price)
-        mean = np.mean(last_price)
-        prob_gain = np.mean(last_price >= S0)
-
-        if not(np.isnan(median) or np.isnan(mean) or prob_gain == 0):
-            res["SET"] = {
-                "Name": "ตลาดหลักทรัพย์แห่งประเทศไทย",
-                "start_price": float(S0),
-                "median": float(median),
-                "mean": float(mean),
-                "prob_gain": float(prob_gain),
-                "prob_loss": 1.0-float(prob_gain)
+
+    # (result key, display name, S0, mu_y, sigma_y, last date, monthly log
+    # returns), simulated together
+    rows = []
+    timer = StageTimer()
+    failed, fetch_errors = [], []
+
+    with timer.stage("fetch"):
+        # only the missing days are downloaded; on error the stored ones are used
+        try:
+            price_store.update("^SET.BK", start, end)
+        except Exception:
+            fetch_errors.append("^SET.BK")
+    with timer.stage("load"):
+        price_monthly = price_store.close_monthly("^SET.BK", start, end, refresh=False)
+        if len(price_monthly) >= 2:
+            mu_y, sigma_y = fit_gbm(price_monthly)
+            S0 = float(np.asarray(price_monthly.iloc[-1]).ravel()[0])
+            history = np.diff(np.log(np.asarray(price_monthly, dtype=float).ravel()))
+            rows.append(("SET", "ตลาดหลักทรัพย์แห่งประเทศไทย", S0, mu_y, sigma_y, str(end), history))
+        else:
+            failed.append("SET")
+
+        if indexes is None:
+            index_registry.maybe_reload()
+            indexes = index_registry.snapshot()
+        for ind in all_ind:
+            st = indexes[ind]
+            rows.append((call_ind[ind], name_ind[ind], st.S0, st.mu_y, st.sigma_y, st.last_date,
+                         np.diff(np.log(st.prices))))
+
+    keys, names, S0s, mus, sigmas, last_dates, histories = zip(*rows)
+    with timer.stage("simulate"):
+        model = return_model_for(return_model, years_forecast, rng, histories)
+        medians, means, prob_gains, precision = simulate_rows(
+            keys, S0s, mus, sigmas, years_forecast, n_sims, mode, rng, target_se, sampling, model)
+        if precision is not None:
+            res["Precision"] = precision
+
+    with timer.stage("summarize"):
+        build_result(res, zip(keys, names, S0s, medians, means, prob_gains, last_dates), failed)
+
+    if fan_quantiles:
+        with timer.stage("fan"):
+            fan_sims = FAN_MAX_SIMS if mode == "adaptive" else n_sims
+            bands, used = fan_bands(S0s, mus, sigmas, years_forecast, fan_sims, mode, rng, sampling,
+                                    fan_quantiles, model)
+            res["Fan"] = {
+                "quantiles": list(fan_quantiles),
+                "months": int(years_forecast * 12),
+                "sims": used,
+                "bands": {key: bands[i] for i, key in enumerate(keys) if key not in failed},
             }
-            res["Last_Time_for_SET"] = str(end)
-    
-    for ind in all_ind:
-        BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-        fn = str(ind) + ".csv"
-        csv_path = os.path.join(BASE_DIR, "..", "data", "stockdata", fn)
-        df = pd.read_csv(csv_path, index_col=0, parse_dates=True)
-        log_returns_monthly = np.log(df / df.shift(1)).dropna()
-        mu_y = float(log_returns_monthly.mean()) * 12.0
-        sigma_y = float(log_returns_monthly.std(ddof=1)) * np.sqrt(12.0)
-        S0 = df.iloc[-1]
-        paths = monte_carlo_gbm_monthly(S0, mu_y, sigma_y, years_forecast, n_sims=n_sims)
-        S0 = float(S0)
-        last_price = paths[-1, :]
-
-        median = np.median(last_price)
-        mean = np.mean(last_price)
-        prob_gain = np.mean(last_price >= S0)
 
+    if stats is not None:
+        stats.update(stages=timer.stages, failed=failed, fetch_errors=fetch_errors)
+    return res
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+def build_result(res, rows, failed):
+    # Fill res from (key, name, S0, median, mean, prob_gain, last_date) rows;
+    # keys whose summary is unusable go to failed instead.
+    for key, name, S0, median, mean, prob_gain, last_date in rows:
+        median, mean, prob_gain = float(median), float(mean), float(prob_gain)
         if np.isnan(median) or np.isnan(mean) or prob_gain == 0:
-            fail.append(ind)
+            failed.append(key)
             continue
-        
-        res[call_ind[ind]] = {
-            "Name": name_ind[ind],
-            "start_price": float(S0),
-            "median": float(median),
-            "mean": float(mean),
-            "prob_gain": float(prob_gain),
-            "prob_loss": 1.0-float(prob_gain)
+
+        res[key] = {
+            "Name": name,
+            "start_price": S0,
+            "median": median,
+            "mean": mean,
+            "prob_gain": prob_gain,
+            "prob_loss": 1.0-prob_gain
         }
 
-        if (res['Last_Time_for_index'] == None):
-            res['Last_Time_for_index'] = str(df.index[-1])[:10]
+        if key == "SET":
+            res["Last_Time_for_SET"] = last_date
+        elif (res['Last_Time_for_index'] == None):
+            res['Last_Time_for_index'] = last_date
 
     return res
 #----------------------------------------------------------------------------------#
 
+#----------------------------------------------------------------------------------#
+def forecast_symbols(entries, years_forecast, n_sims=10000, mode="sampled", seed=None,
+                     target_se=0.005, sampling="plain", return_model="gbm", stats=None):
+    # entries: SymbolStats (MS_Symbols) already resolved by the caller, all
+    # simulated in one batch. No price data is read here.
+    error = check_request(years_forecast, n_sims, mode, target_se, sampling, len(entries), return_model)
+    if error:
+        return {"Error": error}
+    # the API already moved these to no_data; direct callers get them as failed
+    entries, failed = split_history(entries, return_model)
+    if not entries:
+        return {"Symbols": {}}
+
+    timer = StageTimer()
+    rng = np.random.default_rng(seed)
+    keys = [e.symbol for e in entries]
+    with timer.stage("simulate"):
+        model = return_model_for(return_model, years_forecast, rng, [e.log_returns for e in entries])
+        medians, means, prob_gains, precision = simulate_rows(
+            keys, [e.S0 for e in entries], [e.mu_y for e in entries], [e.sigma_y for e in entries],
+            years_forecast, n_sims, mode, rng, target_se, sampling, model)
+
+    res = {"Symbols": {}}
+    with timer.stage("summarize"):
+        for e, median, mean, prob_gain in zip(entries, medians, means, prob_gains):
+            median, mean, prob_gain = float(median), float(mean), float(prob_gain)
+            if np.isnan(median) or np.isnan(mean):
+                failed.append(e.symbol)
+                continue
+            res["Symbols"][e.symbol] = {
+                "Name": e.name,
+                "Sector": e.sector,
+                "start_price": e.S0,
+                "median": median,
+                "mean": mean,
+                "prob_gain": prob_gain,
+                "prob_loss": 1.0-prob_gain,
+                "last_date": e.last_date,
+            }
+    if precision is not None:
+        res["Precision"] = precision
+
+    if stats is not None:
+        stats.update(stages=timer.stages, failed=failed, fetch_errors=[])
+    return res
+
+
+def forecast_symbols_with_stats(*args):
+    stats = {}
+    res = forecast_symbols(*args, stats=stats)
+    return res, stats
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+def forecast_with_stats(*args):
+    # Pool entry point: the result plus the stats the API turns into metrics.
+    stats = {}
+    res = forecast_stock_prices(*args, stats=stats)
+    return res, stats
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+def warm_worker():
+    # Run once in each pool worker at startup: importing this module there,
+    # numpy's first RNG call and pandas (imported lazily by the price store,
+    # ~0.3 s) all happen before the first real request. Reading the stored
+    # ^SET.BK closes also maps its file; nothing is downloaded.
+    np.random.default_rng(0).standard_normal(1)
+    yst = datetime.now().year - year_window
+    price_store.close_monthly("^SET.BK", f"{yst}-01-01", datetime.today().strftime('%Y-%m-%d'), refresh=False)
+    return os.getpid()
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+def data_version():
+    # Index build version plus the day, since ^SET.BK is refreshed at most daily.
+    return f"{index_registry.maybe_reload()}:{datetime.today().strftime('%Y-%m-%d')}"
+
+
+def symbols_version():
+    # Symbol forecasts depend on the symbol index build, not the industry CSVs.
+    return f"s{symbol_index.version}:{datetime.today().strftime('%Y-%m-%d')}"
+#----------------------------------------------------------------------------------#
+
 # For testing
-# pprint(forecast_stock_prices(5))
-# print("fail:", fail)
\ No newline at end of file
+# stats = {}
+# print(forecast_stock_prices(5, stats=stats))
+# print("stats:", stats)
\ No newline at end of file
@@ -0,0 +1,184 @@
+import json
+import os
+import struct
+from statistics import NormalDist
+
+import numpy as np
+
+from app.MS_Models import GBMModel
+from app.MS_Sampling import NormalSampler
+
+
+FAN_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+# paths behind the sampled bands; p5..p95 are already stable to ~0.5 % at 20000
+FAN_MAX_SIMS = int(os.environ.get("MS_FAN_MAX_SIMS", 20000))
+# fewest paths per index when every index needs its own histogram
+FAN_MIN_SIMS = 2000
+# (sims, months, k) float64 block per streaming chunk
+FAN_CHUNK_MB = 32
+# histogram of each (month, index) in units of the model's own standard
+# deviation: FAN_BINS bins over +-FAN_RANGE sd, ~0.01 sd wide before interpolation
+FAN_BINS = 1200
+FAN_RANGE = 6.0
+
+BINARY_MAGIC = b"MSFAN\0\0\0"
+
+
+#----------------------------------------------------------------------------------#
+def exact_bands(S0, mu_y, sigma_y, years, quantiles=FAN_QUANTILES):
+    # Closed-form GBM quantiles for months 0..M: float32 (k, len(quantiles), M+1).
+    S0, mu_y, sigma_y = (np.atleast_1d(np.asarray(v, dtype=float)) for v in (S0, mu_y, sigma_y))
+    t = np.arange(int(years * 12) + 1) / 12.0
+    z = np.array([NormalDist().inv_cdf(q) for q in quantiles])
+    m = (mu_y - 0.5 * sigma_y**2)[:, None, None] * t
+    s = sigma_y[:, None, None] * np.sqrt(t) * z[None, :, None]
+    return (S0[:, None, None] * np.exp(m + s)).astype(np.float32)
+
+
+def histogram_quantiles(draw_chunk, n_sims, months, quantiles=FAN_QUANTILES):
+    # Quantiles per month of standardized paths, in one streaming pass:
+    # draw_chunk(n) -> (n, months) values in units of each month's standard
+    # deviation. Every chunk is folded into a fixed-grid histogram per month
+    # and dropped, so memory is the histograms plus one chunk whatever
+    # n_sims. Returns (len(quantiles), months), linearly interpolated inside
+    # the bin where the cumulative count crosses each quantile.
+    chunk = max(1, int(FAN_CHUNK_MB * 2**20 // (8 * months)))
+    scale = FAN_BINS / (2.0 * FAN_RANGE)
+    cell = np.arange(months) * FAN_BINS
+    counts = np.zeros(months * FAN_BINS, dtype=np.int64)
+    for lo in range(0, n_sims, chunk):
+        u = draw_chunk(min(chunk, n_sims - lo))
+        idx = np.clip(((u + FAN_RANGE) * scale).astype(np.int64), 0, FAN_BINS - 1)
+        idx += cell
+        counts += np.bincount(idx.ravel(), minlength=counts.size)
+    counts = counts.reshape(months, FAN_BINS)
+
+    cum = np.cumsum(counts, axis=1)
+    edges = np.linspace(-FAN_RANGE, FAN_RANGE, FAN_BINS + 1)
+    out = np.empty((len(quantiles), months))
+    for j, q in enumerate(quantiles):
+        target = q * n_sims
+        b = np.minimum((cum < target).sum(axis=1), FAN_BINS - 1)
+        below = np.where(b > 0, cum[np.arange(months), np.maximum(b - 1, 0)], 0)
+        inside = counts[np.arange(months), b]
+        frac = np.where(inside > 0, (target - below) / np.maximum(inside, 1), 0.5)
+        out[j] = edges[b] + np.clip(frac, 0.0, 1.0) * (edges[1] - edges[0])
+    return out
+
+
+def paths_per_index(n_sims, k, model=None):
+    # Paths behind each index's bands: all n_sims when the shocks are shared,
+    # else an equal share of them, at least FAN_MIN_SIMS.
+    if model is None or model.shared:
+        return n_sims
+    return max(FAN_MIN_SIMS, n_sims // k)
+
+
+def sampled_bands(S0, mu_y, sigma_y, years, n_sims, rng=None, sampling="plain", quantiles=FAN_QUANTILES,
+                  model=None):
+    # Monthly paths streamed through histogram_quantiles. The paths are drawn
+    # once in standardized form, cumsum(z_1..z_t) / sqrt(t), and mapped to
+    # every index through its own drift and volatility (common random
+    # numbers), so the cost does not grow with the number of indexes. A
+    # return model without shared shocks (the bootstrap resamples each
+    # index's own history) gets one histogram per index, each on an equal
+    # share of the paths; its paths are plain resamples, so ``sampling`` does
+    # not apply to them.
+    rng = np.random.default_rng() if rng is None else rng
+    S0, mu_y, sigma_y = (np.atleast_1d(np.asarray(v, dtype=float)) for v in (S0, mu_y, sigma_y))
+    months = int(years * 12)
+    if months == 0:
+        return np.repeat(S0[:, None, None], len(quantiles), axis=1).astype(np.float32)
+    # one sampler dimension per month
+    sampler = NormalSampler(months, sampling, rng)
+    model = GBMModel(months, rng) if model is None else model
+
+    if model.shared:
+        u_q = histogram_quantiles(lambda n: model.paths(n, sampler), n_sims, months, quantiles)[None]
+    else:
+        n_each = paths_per_index(n_sims, len(S0), model)
+        u_q = np.stack([histogram_quantiles(lambda n, i=i: model.paths(n, sampler, i), n_each, months, quantiles)
+                        for i in range(len(S0))])
+    t = np.arange(1, months + 1) / 12.0
+    # log(S_t / S0) = (mu - sigma^2 / 2) t + sigma sqrt(t) u, for (k, q, months)
+    log_ret = ((mu_y - 0.5 * sigma_y**2)[:, None, None] * t
+               + sigma_y[:, None, None] * np.sqrt(t) * u_q)
+    out = np.empty((len(S0), len(quantiles), months + 1), dtype=np.float32)
+    out[:, :, 0] = S0[:, None]
+    out[:, :, 1:] = S0[:, None, None] * np.exp(log_ret)
+    return out
+
+
+def fan_bands(S0, mu_y, sigma_y, years, n_sims, mode, rng=None, sampling="plain", quantiles=FAN_QUANTILES,
+              model=None):
+    # Bands for the forecast mode: closed form for exact, sampled otherwise
+    # (adaptive included) on at most FAN_MAX_SIMS paths. model: MS_Models
+    # return model, None for GBM. Returns (bands, sims), sims being the paths
+    # behind each index's bands.
+    if mode == "exact":
+        return exact_bands(S0, mu_y, sigma_y, years, quantiles), 0
+    sims = min(n_sims, FAN_MAX_SIMS)
+    bands = sampled_bands(S0, mu_y, sigma_y, years, sims, rng, sampling, quantiles, model)
+    return bands, paths_per_index(sims, len(np.atleast_1d(S0)), model)
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+# A result with a "Fan" block holds its bands as float32 arrays until it is
+# encoded for the response, in one of three formats.
+MEDIA_TYPES = {"binary": "application/octet-stream", "msgpack": "application/msgpack"}
+
+
+def _split_bands(res):
+    # (result without the arrays, [(key, float32 array), ...])
+    fan = res.get("Fan")
+    if not fan:
+        return res, []
+    arrays = list(fan["bands"].items())
+    return {**res, "Fan": {k: v for k, v in fan.items() if k != "bands"}}, arrays
+
+
+def to_json(res):
+    # Bands as nested lists at float32 precision (7 significant digits).
+    head, arrays = _split_bands(res)
+    if not arrays:
+        return res
+    bands = {key: [[float(f"{x:.7g}") for x in row] for row in a.tolist()] for key, a in arrays}
+    return {**head, "Fan": {**head["Fan"], "bands": bands}}
+
+
+def to_binary(res):
+    # MSFAN\0\0\0 | uint32 header length | JSON header | float32 bands.
+    # The header is the JSON result with, for every band key, the byte offset
+    # of its (quantiles, months) float32 block after the header.
+    head, arrays = _split_bands(res)
+    offsets, blobs, pos = {}, [], 0
+    for key, a in arrays:
+        blob = np.ascontiguousarray(a, dtype="<f4").tobytes()
+        offsets[key] = {"offset": pos, "shape": list(a.shape)}
+        blobs.append(blob)
+        pos += len(blob)
+    if arrays:
+        head = {**head, "Fan": {**head["Fan"], "dtype": "<f4", "bands": offsets}}
+    header = json.dumps(head, ensure_ascii=False).encode("utf-8")
+    return BINARY_MAGIC + struct.pack("<I", len(header)) + header + b"".join(blobs)
+
+
+def to_msgpack(res):
+    # Bands as msgpack bin (raw little-endian float32) with their shape.
+    import msgpack
+    head, arrays = _split_bands(res)
+    if arrays:
+        head = {**head, "Fan": {**head["Fan"], "dtype": "<f4", "bands": {
+            key: {"shape": list(a.shape), "data": np.ascontiguousarray(a, dtype="<f4").tobytes()}
+            for key, a in arrays
+        }}}
+    return msgpack.packb(head, use_bin_type=True)
+
+
+def msgpack_available():
+    try:
+        import msgpack  # noqa: F401
+    except ImportError:
+        return False
+    return True
+#----------------------------------------------------------------------------------#
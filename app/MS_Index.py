@@ -0,0 +1,172 @@
+import logging
+import os
+import threading
+import time
+from typing import NamedTuple
+
+import numpy as np
+
+from app.MS_Bundle import BUNDLE_PATH, read_bundle
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STOCKDATA_DIR = os.path.join(BASE_DIR, "..", "data", "stockdata")
+
+logger = logging.getLogger("uvicorn.error")
+
+
+#----------------------------------------------------------------------------------#
+def fit_gbm(prices):
+    # Annualised (mu_y, sigma_y) from monthly closes.
+    prices = np.asarray(prices, dtype=float).ravel()
+    log_returns_monthly = np.diff(np.log(prices))
+    mu_y = float(log_returns_monthly.mean()) * 12.0
+    sigma_y = float(log_returns_monthly.std(ddof=1)) * np.sqrt(12.0)
+    return mu_y, sigma_y
+#----------------------------------------------------------------------------------#
+
+
+class IndexStats(NamedTuple):
+    name: str
+    dates: np.ndarray
+    prices: np.ndarray
+    mu_y: float
+    sigma_y: float
+    S0: float
+    last_date: str
+
+
+class IndexRegistry:
+    """In-memory monthly series and GBM fits for the industry indexes.
+
+    Everything is read once by ``load()`` (at startup), from the binary
+    bundle written by the index builder when it holds every index (one
+    mmap, see ``app.MS_Bundle``), else from the per-index CSVs. A CSV newer
+    than the bundle (edited by hand or by the notebook without rewriting the
+    bundle) makes the load fall back to the CSVs, with a warning.
+    ``maybe_reload()`` is cheap to call per request: it stats the source
+    files at most every ``check_interval`` seconds and reloads only when an
+    mtime changed. ``version`` increases on every (re)load so callers can
+    key caches on it.
+    """
+
+    def __init__(self, names, data_dir=STOCKDATA_DIR, check_interval=30.0, bundle_path=BUNDLE_PATH):
+        self.names = list(names)
+        self.data_dir = data_dir
+        self.bundle_path = bundle_path
+        # "bundle" or "csv", whichever the last load read
+        self.source = None
+        self.check_interval = check_interval
+        self.version = 0
+        self.loaded_at = None
+        # seconds per index for the last (re)load, for metrics
+        self.load_seconds = {}
+        self._stats = {}
+        self._mtimes = {}
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._listeners = []
+
+    def path(self, name):
+        return os.path.join(self.data_dir, str(name) + ".csv")
+
+    def _read_mtimes(self):
+        # The bundle's and the CSVs', so a CSV rewritten after the bundle is noticed.
+        mtimes = {}
+        if self.bundle_path and os.path.exists(self.bundle_path):
+            mtimes["bundle"] = os.path.getmtime(self.bundle_path)
+        mtimes.update({name: os.path.getmtime(self.path(name)) for name in self.names
+                       if "bundle" not in mtimes or os.path.exists(self.path(name))})
+        return mtimes
+
+    def _read_bundle(self, mtimes):
+        # The bundle, or None when there is none, it lacks one of our indexes
+        # or a CSV has been written after it.
+        if "bundle" not in mtimes:
+            return None
+        newer = [name for name in self.names if mtimes.get(name, 0.0) > mtimes["bundle"]]
+        if newer:
+            logger.warning("index CSVs newer than %s, reading the CSVs (run python -m app.MS_Bundle): %s",
+                           self.bundle_path, ", ".join(newer))
+            return None
+        bundle = read_bundle(self.bundle_path)
+        if not set(self.names) <= set(bundle.names):
+            return None
+        return bundle
+
+    def _from_bundle(self, bundle, name):
+        dates, prices = bundle.series(name)
+        gaps = np.isnan(prices)
+        if gaps.any():
+            dates, prices = dates[~gaps], prices[~gaps]
+        mu_y, sigma_y = fit_gbm(prices)
+        return IndexStats(name, dates, prices, mu_y, sigma_y, float(prices[-1]), str(dates[-1]))
+
+    def _load_one(self, name):
+        # pandas only loads with the first index read (startup warmup)
+        import pandas as pd
+        df = pd.read_csv(self.path(name), index_col=0, parse_dates=True)
+        prices = df.iloc[:, 0].to_numpy(dtype=float)
+        dates = df.index.values.astype("M8[D]")
+        mu_y, sigma_y = fit_gbm(prices)
+        return IndexStats(name, dates, prices, mu_y, sigma_y, float(prices[-1]), str(dates[-1]))
+
+    def load(self):
+        with self._lock:
+            mtimes = self._read_mtimes()
+            bundle = self._read_bundle(mtimes)
+            stats, seconds = {}, {}
+            for name in self.names:
+                t0 = time.perf_counter()
+                stats[name] = self._from_bundle(bundle, name) if bundle else self._load_one(name)
+                seconds[name] = time.perf_counter() - t0
+            self.source = "bundle" if bundle else "csv"
+            self._stats = stats
+            self.load_seconds = seconds
+            self._mtimes = mtimes
+            self._last_check = time.monotonic()
+            self.loaded_at = time.time()
+            self.version += 1
+            version = self.version
+        for listener in list(self._listeners):
+            listener(version)
+        return version
+
+    reload = load
+
+    def on_reload(self, listener):
+        # listener(version) is called after every (re)load.
+        self._listeners.append(listener)
+
+    def maybe_reload(self):
+        if not self._stats:
+            return self.load()
+        now = time.monotonic()
+        if now - self._last_check < self.check_interval:
+            return self.version
+        self._last_check = now
+        try:
+            changed = self._read_mtimes() != self._mtimes
+        except OSError:
+            # mid-rebuild, keep serving what is loaded
+            return self.version
+        return self.load() if changed else self.version
+
+    def get(self, name):
+        if not self._stats:
+            self.load()
+        return self._stats[name]
+
+    def snapshot(self):
+        # Plain dict of IndexStats, small enough to ship to a worker process.
+        if not self._stats:
+            self.load()
+        return dict(self._stats)
+
+    def status(self):
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "source": self.source,
+            "indexes": {name: st.last_date for name, st in self._stats.items()},
+        }
@@ -0,0 +1,201 @@
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+META_PATH = os.environ.get("MS_META_PATH", os.path.join(BASE_DIR, "..", "data", "meta", "tickers.sqlite"))
+# rows older than this are fetched again by refresh()
+META_MAX_AGE_DAYS = float(os.environ.get("MS_META_MAX_AGE_DAYS", "7"))
+
+INFO_FIELDS = ("marketCap", "sharesOutstanding", "floatShares")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tickers (
+    symbol            TEXT PRIMARY KEY,
+    marketCap         REAL,
+    sharesOutstanding REAL,
+    floatShares       REAL,
+    fetched_at        REAL,
+    attempts          INTEGER NOT NULL DEFAULT 0,
+    error             TEXT
+);
+CREATE TABLE IF NOT EXISTS shares_history (
+    symbol TEXT NOT NULL,
+    date   TEXT NOT NULL,
+    shares REAL NOT NULL,
+    PRIMARY KEY (symbol, date)
+)
+"""
+
+
+#----------------------------------------------------------------------------------#
+def yfinance_info(symbol):
+    import yfinance as yf
+    return yf.Ticker(symbol).info
+
+
+def yfinance_shares_history(symbol):
+    # [(date, shares outstanding), ...] as reported over time.
+    import yfinance as yf
+    s = yf.Ticker(symbol).get_shares_full(start="2000-01-01")
+    if s is None or len(s) == 0:
+        return []
+    return [(str(d)[:10], float(v)) for d, v in s.items()]
+
+
+def fetch_with_retries(fetcher, symbol, retries=3, backoff=0.5, allow_empty=False):
+    # (info, attempts, error). An empty answer counts as a failure unless
+    # allow_empty, since yfinance .info returns {} rather than raising when
+    # it is rate limited.
+    error = None
+    for attempt in range(1, retries + 1):
+        try:
+            info = fetcher(symbol)
+            if info or allow_empty:
+                return info, attempt, None
+            error = "empty response"
+        except Exception as e:
+            error = repr(e)
+        if attempt < retries:
+            time.sleep(backoff * 2 ** (attempt - 1))
+    return {}, retries, error
+#----------------------------------------------------------------------------------#
+
+
+class MetaStore:
+    """Ticker metadata table (SQLite), one row per ticker.
+
+    Each row holds ``INFO_FIELDS`` with the time they were fetched, so a
+    build only asks yfinance about tickers it has never seen or whose row is
+    older than ``max_age_days``. A failed fetch keeps the previous values and
+    records the error; it is retried on the next refresh whatever its age.
+    Tickers missing any field are the ones the index cannot weight
+    (``incomplete()``, formerly the hand-kept ``cant_cal`` list).
+
+    With a ``history_fetcher`` the same refresh also stores each ticker's
+    reported shares outstanding over time (``shares_history``), which the
+    index builder uses for time-varying weights.
+    """
+
+    def __init__(self, path=META_PATH, fetcher=yfinance_info, max_age_days=META_MAX_AGE_DAYS,
+                 history_fetcher=None):
+        self.path = path
+        self.fetcher = fetcher
+        self.history_fetcher = history_fetcher
+        self.max_age_days = max_age_days
+        self.errors = {}
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.executescript(SCHEMA)
+        return self._conn
+
+    def rows(self, symbols=None):
+        # symbol -> row dict, for the given symbols (default: every row).
+        with self._lock:
+            cur = self._db().execute("SELECT * FROM tickers")
+            out = {r["symbol"]: dict(r) for r in cur}
+        if symbols is not None:
+            out = {s: out[s] for s in symbols if s in out}
+        return out
+
+    def stale(self, symbols, now=None):
+        # Symbols without a fresh, error-free row.
+        now = time.time() if now is None else now
+        rows = self.rows()
+        cutoff = now - self.max_age_days * 86400
+        return [s for s in symbols
+                if s not in rows or rows[s]["error"] or (rows[s]["fetched_at"] or 0) < cutoff]
+
+    def _fetch(self, symbol, retries, backoff):
+        info, attempts, error = fetch_with_retries(self.fetcher, symbol, retries, backoff)
+        history = []
+        if self.history_fetcher is not None and not error:
+            # optional: a ticker without a share history keeps constant weights
+            history, _, _ = fetch_with_retries(self.history_fetcher, symbol, retries, backoff, allow_empty=True)
+        return info, attempts, error, history
+
+    def _write(self, symbol, info, attempts, error, now, history=()):
+        values = [info.get(k) for k in INFO_FIELDS]
+        with self._lock:
+            db = self._db()
+            if error:
+                # keep the last good values, only note the failure
+                db.execute(
+                    "INSERT INTO tickers (symbol, attempts, error) VALUES (?, ?, ?) "
+                    "ON CONFLICT(symbol) DO UPDATE SET attempts = excluded.attempts, error = excluded.error",
+                    (symbol, attempts, error),
+                )
+            else:
+                db.execute(
+                    "INSERT OR REPLACE INTO tickers (symbol, marketCap, sharesOutstanding, floatShares, "
+                    "fetched_at, attempts, error) VALUES (?, ?, ?, ?, ?, ?, NULL)",
+                    (symbol, *values, now, attempts),
+                )
+            if history:
+                db.execute("DELETE FROM shares_history WHERE symbol = ?", (symbol,))
+                db.executemany("INSERT OR REPLACE INTO shares_history VALUES (?, ?, ?)",
+                               [(symbol, d, v) for d, v in history])
+            db.commit()
+
+    def refresh(self, symbols, workers=16, retries=3, backoff=0.5, force=False):
+        # Fetch every stale symbol concurrently; returns {symbol: error} for this run.
+        todo = list(symbols) if force else self.stale(symbols)
+        errors = {}
+        if not todo:
+            return errors
+        with ThreadPoolExecutor(workers) as ex:
+            futures = {ex.submit(self._fetch, s, retries, backoff): s for s in todo}
+            for fut in as_completed(futures):
+                symbol = futures[fut]
+                info, attempts, error, history = fut.result()
+                self._write(symbol, info, attempts, error, time.time(), history)
+                if error:
+                    errors[symbol] = error
+        self.errors.update(errors)
+        return errors
+
+    def get(self, symbol):
+        with self._lock:
+            row = self._db().execute("SELECT * FROM tickers WHERE symbol = ?", (symbol,)).fetchone()
+        row = dict(row) if row else {}
+        return {k: row.get(k) for k in INFO_FIELDS}
+
+    def complete(self, symbol):
+        return all(self.get(symbol)[k] for k in INFO_FIELDS)
+
+    def incomplete(self, symbols=None):
+        # Stored tickers missing marketCap, sharesOutstanding or floatShares,
+        # without the exchange suffix.
+        rows = self.rows(symbols)
+        return sorted(s.replace(".BK", "") for s, r in rows.items() if not all(r[k] for k in INFO_FIELDS))
+
+    def shares_history(self, symbols):
+        # symbol -> (dates datetime64[D], shares) for the symbols with a history.
+        out = {}
+        with self._lock:
+            cur = self._db().execute("SELECT symbol, date, shares FROM shares_history ORDER BY symbol, date")
+            rows = cur.fetchall()
+        wanted = set(symbols)
+        for symbol, date, shares in rows:
+            if symbol in wanted:
+                out.setdefault(symbol, ([], []))
+                out[symbol][0].append(date)
+                out[symbol][1].append(shares)
+        return {s: (np.array(d, dtype="M8[D]"), np.array(v, dtype=float)) for s, (d, v) in out.items()}
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
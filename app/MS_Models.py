@@ -0,0 +1,259 @@
+import os
+import threading
+
+import numpy as np
+
+
+# gbm: Gaussian monthly log returns (the original model)
+# student_t: monthly log returns scaled by a unit-variance Student-t mixing
+#   variable, fatter tails with the same mean and volatility
+# bootstrap: blocks of each series' own demeaned monthly log returns,
+#   re-centred on the GBM drift, so it keeps the empirical tails, skew and
+#   short-range autocorrelation
+RETURN_MODELS = ("gbm", "student_t", "bootstrap")
+STUDENT_T_DF = float(os.environ.get("MS_STUDENT_T_DF", 5.0))
+BOOTSTRAP_BLOCK_MONTHS = 12
+# rows of a precomputed distribution table; built once per (model, horizon,
+# series) and reused by every request
+TABLE_SIZE = 2**14
+# tables kept per process (128 KiB each, so 256 MB holds ~2000: a 500-symbol
+# query at a few horizons), least recently used evicted first
+TABLE_CACHE_MB = float(os.environ.get("MS_MODEL_TABLE_CACHE_MB", 256))
+# the bootstrap table is indexed by the sampler's normal on a uniform grid
+# over +-Z_RANGE (cells ~0.0007 wide), which keeps Phi(z) out of the hot loop
+Z_RANGE = 6.0
+# grid step of the bootstrap horizon-sum distribution, in its standard
+# deviations (the discretization adds well under 0.1 % to the spread), and the
+# most grid points it may use
+BOOTSTRAP_GRID_STEP = 0.01
+BOOTSTRAP_MAX_GRID = 2**15
+# (path, series) cells per block of the bootstrap terminal gather
+TERMINAL_BLOCK = 2**20
+
+_tables = {}
+_tables_bytes = 0
+_tables_lock = threading.Lock()
+
+
+def _cached_table(key, build):
+    global _tables_bytes
+    with _tables_lock:
+        table = _tables.pop(key, None)
+        if table is not None:
+            _tables[key] = table
+            return table
+    table = build()
+    with _tables_lock:
+        if key not in _tables:
+            _tables[key] = table
+            _tables_bytes += table.nbytes
+            while _tables_bytes > TABLE_CACHE_MB * 2**20 and len(_tables) > 1:
+                _tables_bytes -= _tables.pop(next(iter(_tables))).nbytes
+    return table
+
+
+def _ndtr(z):
+    from scipy.special import ndtr
+    return ndtr(z)
+
+
+def _phi_grid():
+    return _cached_table(("phi",), lambda: _ndtr(_z_grid()))
+
+
+def _z_grid():
+    return np.linspace(-Z_RANGE, Z_RANGE, TABLE_SIZE)
+
+
+def _grid_pmf(values, lo, w, n):
+    # equally likely values on the grid lo + w * k, each split linearly
+    # between its two neighbouring points (keeps the mean exact)
+    pos = (values - lo) / w
+    k = np.minimum(pos.astype(np.int64), n - 2)
+    f = pos - k
+    return (np.bincount(k, 1.0 - f, n) + np.bincount(k + 1, f, n)) / len(values)
+
+
+#----------------------------------------------------------------------------------#
+class GBMModel:
+    """Standardized shocks of a return model, for the GBM-style engines.
+
+    Every engine maps a standardized shock ``u`` to a log return
+    ``(mu - sigma^2 / 2) t + sigma sqrt(t) u``, so a model only changes the
+    distribution of ``u``. ``terminal(z)`` turns the sampler's normals
+    (n, k) into terminal shocks over ``months`` in place; ``paths(n, i)``
+    gives standardized cumulative shocks (n, months) for series ``i``
+    (any series when ``shared``) for the fan chart.
+    """
+
+    name = "gbm"
+    shared = True
+    # fewest finite monthly returns a series needs
+    min_history = 0
+
+    def __init__(self, months, rng=None, histories=None):
+        self.months = months
+        self.rng = np.random.default_rng() if rng is None else rng
+
+    def terminal(self, z):
+        return z
+
+    def monthly(self, z):
+        return z
+
+    def paths(self, n, sampler, i=0):
+        u = np.cumsum(self.monthly(sampler.draw(n)), axis=1)
+        u /= np.sqrt(np.arange(1, self.months + 1))
+        return u
+
+
+class StudentTModel(GBMModel):
+    """Monthly shocks ``z * sqrt(W)``, ``W = (df - 2) / chi2(df)``.
+
+    Each month is a unit-variance Student-t. Over a horizon the shock is
+    still normal given the mixing variables, with variance ``mean(W)`` over
+    the months, so the terminal engine draws one normal and one
+    ``sqrt(mean(W))`` per path from a precomputed table (one random row per
+    path): a gather on top of the GBM cost, and the same distribution as
+    stepping month by month.
+    """
+
+    name = "student_t"
+
+    def __init__(self, months, rng=None, histories=None, df=STUDENT_T_DF):
+        super().__init__(months, rng)
+        self.df = df
+
+    def _scale_table(self, months):
+        # sqrt(mean(W)) over `months` months, TABLE_SIZE draws
+        def build():
+            rng = np.random.default_rng(0)
+            acc = np.zeros(TABLE_SIZE)
+            for _ in range(months):
+                acc += (self.df - 2.0) / rng.chisquare(self.df, TABLE_SIZE)
+            return np.sqrt(acc / months)
+        return _cached_table(("student_t", self.df, months), build)
+
+    def terminal(self, z):
+        z *= self._scale_table(max(self.months, 1))[self.rng.integers(0, TABLE_SIZE, z.shape)]
+        return z
+
+    def monthly(self, z):
+        z *= self._scale_table(1)[self.rng.integers(0, TABLE_SIZE, z.shape)]
+        return z
+
+
+class BootstrapModel(GBMModel):
+    """Block bootstrap of each series' monthly log returns.
+
+    ``histories[i]`` holds series i's monthly log returns. They are demeaned
+    and scaled by their own standard deviation, then resampled in circular
+    blocks of ``BOOTSTRAP_BLOCK_MONTHS``. The terminal engine reads a
+    precomputed table of the horizon sum per series through the sampler's
+    normals (the table holds the sum's quantile at ``Phi(z)`` on a grid of
+    z), so antithetic and Sobol' sampling still apply and a path costs one
+    gather more than GBM. The table is the bootstrap distribution itself,
+    not a sample of it: the horizon sum is a sum of independent block sums,
+    whose distribution is the convolution power of the block sums' on a
+    grid of ``BOOTSTRAP_GRID_STEP`` standard deviations (FFT). It adds no sampling noise of its own, so
+    adaptive mode's errors are the simulation's.
+    """
+
+    name = "bootstrap"
+    shared = False
+    min_history = 2
+
+    def __init__(self, months, rng=None, histories=None, block=BOOTSTRAP_BLOCK_MONTHS):
+        super().__init__(months, rng)
+        if not histories:
+            raise ValueError("the bootstrap model needs the monthly return history of every series")
+        self.block = block
+        # every series' table side by side, for one gather per block
+        self._stacked = None
+        self.residuals = []
+        for h in histories:
+            h = np.asarray(h, dtype=float)
+            h = h[np.isfinite(h)]
+            if len(h) < self.min_history:
+                raise ValueError("the bootstrap model needs at least two monthly returns per series")
+            sd = h.std(ddof=1)
+            self.residuals.append((h - h.mean()) / (sd if sd > 0 else 1.0))
+
+    def _resample(self, r, n, rng):
+        # (n, months) monthly residuals in circular blocks
+        L, B = len(r), min(self.block, len(r))
+        ext = np.concatenate([r, r[:B]])
+        n_blocks = -(-self.months // B)
+        starts = rng.integers(0, L, (n, n_blocks))
+        idx = (starts[:, :, None] + np.arange(B)).reshape(n, -1)[:, :self.months]
+        return ext[idx]
+
+    def _table(self, i):
+        r = self.residuals[i]
+
+        def build():
+            # the horizon sum is `full` independent block sums plus one of
+            # `rem` months, each block starting anywhere in the circular history
+            L, B = len(r), min(self.block, len(r))
+            c = np.concatenate([[0.0], np.cumsum(np.concatenate([r, r[:B]]))])
+            full, rem = divmod(max(self.months, 1), B)
+            parts = [(c[n:L + n] - c[:L], k) for n, k in ((B, full), (rem, 1)) if n and k]
+            lo = sum(v.min() * k for v, k in parts)
+            span = max(sum((v.max() - v.min()) * k for v, k in parts), 1e-12)
+            sd = np.sqrt(sum(v.var() * k for v, k in parts))
+            grid = int(min(BOOTSTRAP_MAX_GRID, 2 ** np.ceil(np.log2(max(span / (BOOTSTRAP_GRID_STEP * sd), 256)))))
+            w = span / (grid - 1)
+            spectrum = np.ones(grid // 2 + 1, dtype=complex)
+            for v, k in parts:
+                spectrum *= np.fft.rfft(_grid_pmf(v, v.min(), w, grid)) ** k
+            cdf = np.cumsum(np.clip(np.fft.irfft(spectrum, grid), 0.0, None))
+            cdf /= cdf[-1]
+            x = lo + w * np.arange(grid)
+            # float32 halves the table the terminal gather reads from
+            return (np.interp(_phi_grid(), cdf, x) / np.sqrt(max(self.months, 1))).astype(np.float32)
+        return _cached_table(("bootstrap", r.tobytes(), self.block, self.months), build)
+
+    def terminal(self, z):
+        if self._stacked is None:
+            self._stacked = np.concatenate([self._table(i) for i in range(z.shape[1])])
+        # row blocks small enough for the index buffers to stay in cache
+        scale = (TABLE_SIZE - 1) / (2.0 * Z_RANGE)
+        offsets = np.arange(z.shape[1]) * TABLE_SIZE
+        rows = max(1, TERMINAL_BLOCK // z.shape[1])
+        pos = np.empty((min(rows, len(z)), z.shape[1]))
+        idx = np.empty(pos.shape, dtype=np.intp)
+        out = np.empty(pos.shape, dtype=self._stacked.dtype)
+        for lo in range(0, len(z), rows):
+            zb = z[lo:lo + rows]
+            p, i, o = pos[:len(zb)], idx[:len(zb)], out[:len(zb)]
+            np.multiply(zb, scale, out=p)
+            p += Z_RANGE * scale + 0.5
+            np.clip(p, 0, TABLE_SIZE - 1, out=p)
+            i[...] = p
+            i += offsets
+            np.take(self._stacked, i, out=o)
+            zb[...] = o
+        return z
+
+    def paths(self, n, sampler, i=0):
+        # Resampled blocks of series i, drawn from self.rng: the sampler's
+        # normals have nothing to map onto here, so antithetic, moment
+        # matching and Sobol' sampling do not apply to the fan chart paths.
+        u = np.cumsum(self._resample(self.residuals[i], n, self.rng), axis=1)
+        u /= np.sqrt(np.arange(1, self.months + 1))
+        return u
+#----------------------------------------------------------------------------------#
+
+
+MODELS = {m.name: m for m in (GBMModel, StudentTModel, BootstrapModel)}
+
+
+def has_history(name, history):
+    # Enough finite monthly returns for the named model to run on this series.
+    return int(np.isfinite(np.asarray(history, dtype=float)).sum()) >= MODELS[name].min_history
+
+
+def make_model(name, months, rng=None, histories=None):
+    if name not in MODELS:
+        raise ValueError(f"return_model must be one of {', '.join(RETURN_MODELS)}")
+    return MODELS[name](months, rng, histories)
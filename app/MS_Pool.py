@@ -0,0 +1,105 @@
+import asyncio
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+class PoolSaturated(Exception):
+    pass
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class SimulationPool:
+    """Bounded process pool for CPU-bound simulation work.
+
+    At most ``max_workers`` jobs run and ``max_queue`` more wait; anything
+    beyond that is rejected with ``PoolSaturated`` instead of piling up.
+    A job that takes longer than ``timeout`` raises ``PoolTimeout`` for its
+    caller; a job that has already started cannot be killed, so it keeps its
+    slot until it finishes.
+    """
+
+    def __init__(self, max_workers=None, max_queue=None, timeout=30.0):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = 2 * self.max_workers if max_queue is None else max_queue
+        self.timeout = timeout
+        self.in_flight = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._executor = None
+
+    @classmethod
+    def from_env(cls, prefix="MS_POOL"):
+        workers = os.environ.get(f"{prefix}_WORKERS")
+        queue = os.environ.get(f"{prefix}_QUEUE")
+        return cls(
+            max_workers=int(workers) if workers else None,
+            max_queue=int(queue) if queue else None,
+            timeout=float(os.environ.get(f"{prefix}_TIMEOUT", 30)),
+        )
+
+    def _get_executor(self):
+        if self._executor is None:
+            # spawn: workers must not inherit the server's threads/locks
+            self._executor = ProcessPoolExecutor(self.max_workers, mp_context=mp.get_context("spawn"))
+        return self._executor
+
+    def _release(self):
+        self.in_flight -= 1
+
+    async def run(self, fn, *args):
+        if self.in_flight >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            raise PoolSaturated(f"{self.in_flight} simulations already running or queued")
+
+        loop = asyncio.get_running_loop()
+        try:
+            job = self._get_executor().submit(fn, *args)
+        except BrokenProcessPool:
+            self._executor = None
+            job = self._get_executor().submit(fn, *args)
+        self.in_flight += 1
+
+        def done(_):
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                pass
+        job.add_done_callback(done)
+
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(job), self.timeout)
+        except asyncio.TimeoutError:
+            job.cancel()
+            self.timed_out += 1
+            raise PoolTimeout(f"simulation exceeded {self.timeout:g}s")
+        except BrokenProcessPool:
+            self._executor = None
+            raise
+
+    async def warm(self, fn):
+        # Start every worker now instead of on first use: one ``fn`` call per
+        # worker, submitted together so each lands on a fresh process.
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        jobs = [loop.run_in_executor(executor, fn) for _ in range(self.max_workers)]
+        return await asyncio.gather(*jobs)
+
+    def stats(self):
+        return {
+            "max_workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "timeout": self.timeout,
+            "in_flight": self.in_flight,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,226 @@
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from urllib.parse import quote
+
+import numpy as np
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PRICE_DIR = os.environ.get("MS_PRICE_DIR", os.path.join(BASE_DIR, "..", "data", "prices"))
+
+FIELDS = ("Open", "High", "Low", "Close", "Adj Close", "Volume")
+PRICE_DTYPE = np.dtype([("Date", "M8[D]")] + [(f, "f8") for f in FIELDS])
+# A range that comes back empty is not asked again for this long, so a
+# holiday or an outage does not put a download on every request
+EMPTY_RETRY_SECONDS = float(os.environ.get("MS_PRICE_EMPTY_RETRY_SECONDS", 3600))
+# Empty ranges up to this many weekdays are taken for exchange holidays (the
+# longest SET closures, e.g. Songkran) and not reported as fetch errors
+HOLIDAY_MAX_WEEKDAYS = 5
+
+
+#----------------------------------------------------------------------------------#
+def yfinance_fetcher(symbol, start, end):
+    # Default fetcher: daily OHLCV for [start, end) as a flat-column DataFrame.
+    import pandas as pd
+    import yfinance as yf
+    df = yf.download(symbol, start=start, end=end, interval="1d", auto_adjust=False, progress=False)
+    if isinstance(df.columns, pd.MultiIndex):
+        df.columns = df.columns.get_level_values(0)
+    return df
+#----------------------------------------------------------------------------------#
+
+class FetchError(RuntimeError):
+    """The fetcher returned no rows for a range longer than a holiday."""
+
+
+#----------------------------------------------------------------------------------#
+def _to_day(d):
+    if isinstance(d, str):
+        return datetime.strptime(d[:10], "%Y-%m-%d").date()
+    if isinstance(d, datetime):
+        return d.date()
+    return d
+
+
+def _frame_to_rows(df):
+    # Fetcher output -> PRICE_DTYPE rows, missing fields as NaN.
+    if df is None or len(df) == 0:
+        return np.empty(0, dtype=PRICE_DTYPE)
+    import pandas as pd
+    rows = np.empty(len(df), dtype=PRICE_DTYPE)
+    rows["Date"] = pd.to_datetime(df.index).values.astype("M8[D]")
+    for f in FIELDS:
+        rows[f] = df[f].to_numpy(dtype=float) if f in df.columns else np.nan
+    return rows
+#----------------------------------------------------------------------------------#
+
+
+class PriceStore:
+    """Daily OHLCV per symbol, one structured ``.npy`` per symbol.
+
+    A sidecar ``.json`` records the date range already asked of the fetcher,
+    so a symbol is fetched again only for the part of [start, end) it has not
+    seen yet (at most once a day for an up-to-today query). After a range
+    comes back empty the sidecar also holds ``retry_after``, and the symbol
+    is not fetched again before then. ``fetcher`` is any
+    ``fetcher(symbol, start, end) -> DataFrame`` with OHLCV columns.
+    """
+
+    def __init__(self, root=PRICE_DIR, fetcher=yfinance_fetcher):
+        self.root = root
+        self.fetcher = fetcher
+        # one lock per symbol, so concurrent updates of different symbols overlap
+        self._locks = defaultdict(threading.Lock)
+        self._locks_guard = threading.Lock()
+        self._memo = {}
+
+    def _paths(self, symbol):
+        stem = os.path.join(self.root, quote(symbol, safe=".-_"))
+        return stem + ".npy", stem + ".json"
+
+    def _meta(self, symbol):
+        _, meta_path = self._paths(symbol)
+        if not os.path.exists(meta_path):
+            return {}
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def coverage(self, symbol):
+        meta = self._meta(symbol)
+        if meta.get("start") is None:
+            return None
+        return _to_day(meta["start"]), _to_day(meta["end"])
+
+    def retry_after(self, symbol):
+        # Until when an empty fetch holds back new downloads, None if it does not.
+        when = self._meta(symbol).get("retry_after")
+        if when is None or datetime.fromisoformat(when) <= datetime.now():
+            return None
+        return datetime.fromisoformat(when)
+
+    def load(self, symbol):
+        # Whole stored history (memory-mapped), empty array if none.
+        npy_path, _ = self._paths(symbol)
+        if not os.path.exists(npy_path):
+            return np.empty(0, dtype=PRICE_DTYPE)
+        mtime = os.path.getmtime(npy_path)
+        hit = self._memo.get(symbol)
+        if hit is not None and hit[0] == mtime:
+            return hit[1]
+        rows = np.load(npy_path, mmap_mode="r")
+        self._memo[symbol] = (mtime, rows)
+        return rows
+
+    def missing_ranges(self, symbol, start, end):
+        start, end = _to_day(start), _to_day(end)
+        cov = self.coverage(symbol)
+        if cov is None:
+            return [(start, end)] if start < end else []
+        ranges = []
+        if start < cov[0]:
+            ranges.append((start, min(cov[0], end)))
+        if end > cov[1]:
+            ranges.append((max(cov[1], start), end))
+        return ranges
+
+    def update(self, symbol, start, end):
+        # Fetch only what is missing from [start, end) and merge it in. A
+        # range with weekdays that comes back empty (yfinance returns an empty
+        # frame instead of raising) is not added to the coverage, and nothing
+        # is fetched for the symbol for EMPTY_RETRY_SECONDS. FetchError is
+        # raised once the ranges that did return rows are stored, unless every
+        # empty range is short enough to be a holiday.
+        with self._locks_guard:
+            lock = self._locks[symbol]
+        with lock:
+            ranges = self.missing_ranges(symbol, start, end)
+            if not ranges:
+                return 0
+            retry = self.retry_after(symbol)
+            if retry:
+                if len(self.load(symbol)) == 0:
+                    raise FetchError(f"{symbol}: last fetch was empty, next try after {retry:%Y-%m-%d %H:%M}")
+                return 0
+            fetched, covered, empty = [], [], []
+            for a, b in ranges:
+                rows = _frame_to_rows(self.fetcher(symbol, str(a), str(b)))
+                if len(rows) == 0 and np.busday_count(a, b) > 0:
+                    empty.append((a, b))
+                    continue
+                fetched.append(rows)
+                covered.append((a, b))
+
+            retry = None
+            if empty:
+                retry = (datetime.now() + timedelta(seconds=EMPTY_RETRY_SECONDS)).isoformat(timespec="seconds")
+            cov = self.coverage(symbol)
+            if covered:
+                old = np.array(self.load(symbol))
+                rows = np.concatenate([old] + fetched)
+                # later fetches win on duplicate dates
+                _, keep = np.unique(rows["Date"][::-1], return_index=True)
+                rows = rows[::-1][keep]
+
+                # the missing ranges sit either side of the stored coverage,
+                # so what was covered stays one contiguous range
+                lo = min([a for a, _ in covered] + ([cov[0]] if cov else []))
+                hi = max([b for _, b in covered] + ([cov[1]] if cov else []))
+                self._write(symbol, rows, lo, hi, retry)
+            else:
+                self._write_meta(symbol, cov, len(self.load(symbol)), retry)
+            long_empty = [(a, b) for a, b in empty if np.busday_count(a, b) > HOLIDAY_MAX_WEEKDAYS]
+            if long_empty:
+                spans = ", ".join(f"{a}..{b}" for a, b in long_empty)
+                raise FetchError(f"{symbol}: no rows returned for {spans}")
+            return sum(len(f) for f in fetched)
+
+    def _write(self, symbol, rows, lo, hi, retry_after=None):
+        os.makedirs(self.root, exist_ok=True)
+        npy_path, _ = self._paths(symbol)
+        tmp = npy_path + ".tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, rows)
+        os.replace(tmp, npy_path)
+        self._write_meta(symbol, (lo, hi), len(rows), retry_after)
+        self._memo.pop(symbol, None)
+
+    def _write_meta(self, symbol, cov, n_rows, retry_after=None):
+        os.makedirs(self.root, exist_ok=True)
+        _, meta_path = self._paths(symbol)
+        meta = {"symbol": symbol, "start": str(cov[0]) if cov else None, "end": str(cov[1]) if cov else None,
+                "rows": int(n_rows)}
+        if retry_after is not None:
+            meta["retry_after"] = retry_after
+        tmp = meta_path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+
+    def get(self, symbol, start, end, refresh=True):
+        # Rows in [start, end). A failed refresh falls back to what is stored.
+        if refresh:
+            try:
+                self.update(symbol, start, end)
+            except Exception:
+                if len(self.load(symbol)) == 0:
+                    raise
+        rows = self.load(symbol)
+        lo = np.datetime64(_to_day(start), "D")
+        hi = np.datetime64(_to_day(end), "D")
+        i, j = np.searchsorted(rows["Date"], [lo, hi])
+        return rows[i:j]
+
+    def frame(self, symbol, start, end, refresh=True):
+        # pandas only loads once a frame is actually needed (cold start)
+        import pandas as pd
+        rows = self.get(symbol, start, end, refresh=refresh)
+        df = pd.DataFrame({f: rows[f] for f in FIELDS}, index=pd.DatetimeIndex(rows["Date"], name="Date"))
+        return df
+
+    def close_monthly(self, symbol, start, end, refresh=True):
+        close = self.frame(symbol, start, end, refresh=refresh)["Close"].dropna()
+        return close.resample("ME").last().dropna()
+
@@ -0,0 +1,59 @@
+import warnings
+
+import numpy as np
+
+
+# plain: independent pseudo-random normals (the original sampler)
+# antithetic: every draw z is paired with -z
+# moment_matching: each batch is shifted/scaled to sample mean 0, variance 1
+# sobol: scrambled Sobol' points mapped through the normal inverse CDF
+SAMPLING_METHODS = ("plain", "antithetic", "moment_matching", "sobol")
+
+
+class NormalSampler:
+    """Standard-normal draws of shape (n, dim) for a choice of sampler.
+
+    State carries across ``draw`` calls, so a run made of several batches
+    (chunked or adaptive engines) continues one Sobol' sequence instead of
+    restarting it. ``plain`` uses ``rng.standard_normal`` exactly as before,
+    so seeded results of the plain sampler do not change. scipy is only
+    imported for ``sobol``.
+    """
+
+    def __init__(self, dim, method="plain", rng=None):
+        if method not in SAMPLING_METHODS:
+            raise ValueError(f"sampling must be one of {', '.join(SAMPLING_METHODS)}")
+        self.dim = dim
+        self.method = method
+        self.rng = np.random.default_rng() if rng is None else rng
+        self._sobol = None
+
+    def draw(self, n, out=None):
+        out = np.empty((n, self.dim)) if out is None else out
+        if self.method == "plain":
+            self.rng.standard_normal(out=out)
+        elif self.method == "antithetic":
+            half = (n + 1) // 2
+            self.rng.standard_normal(out=out[:half])
+            np.negative(out[:n - half], out=out[half:])
+        elif self.method == "moment_matching":
+            self.rng.standard_normal(out=out)
+            if n > 1:
+                out -= out.mean(axis=0)
+                out /= out.std(axis=0)
+        else:
+            out[:] = self._sobol_normals(n)
+        return out
+
+    def _sobol_normals(self, n):
+        from scipy.special import ndtri
+        from scipy.stats import qmc
+
+        if self._sobol is None:
+            self._sobol = qmc.Sobol(self.dim, scramble=True, seed=self.rng)
+        with warnings.catch_warnings():
+            # balance is best at powers of two, but any prefix of the
+            # sequence is still low-discrepancy; n_sims is the caller's choice
+            warnings.simplefilter("ignore", UserWarning)
+            u = self._sobol.random(n)
+        return ndtri(np.clip(u, 1e-12, 1.0 - 1e-12))
@@ -0,0 +1,175 @@
+import csv
+import os
+import threading
+import time
+from datetime import datetime
+from typing import NamedTuple
+
+import numpy as np
+
+from app.MS_Index import fit_gbm
+from app.MS_Map_Cat import ticker_sector
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.join(BASE_DIR, "..", "data")
+TH_ALL_PATH = os.path.join(DATA_DIR, "th_all.csv")
+MARKET_LIST_PATH = os.path.join(DATA_DIR, "Market_Stock_List.csv")
+
+
+class SymbolStats(NamedTuple):
+    symbol: str
+    name: str
+    sector: str
+    sector_th: str
+    industry: str
+    log_returns: np.ndarray
+    mu_y: float
+    sigma_y: float
+    S0: float
+    last_date: str
+
+
+#----------------------------------------------------------------------------------#
+def load_listing(path=MARKET_LIST_PATH):
+    # symbol -> (company name, industry) from the SET/mai listing.
+    with open(path, encoding="utf-8-sig") as f:
+        return {
+            r["Symbol"]: (r["Company"], "Industrial" if r["Industry"] == "Industrials" else r["Industry"])
+            for r in csv.DictReader(f)
+        }
+
+
+def load_sectors(listing, th_all_path=TH_ALL_PATH):
+    # symbol -> [(english sector, thai sector), ...]. MS_Map_Cat gives every
+    # ticker its main sector; th_all.csv adds further memberships. Its rows
+    # also hold sector-index codes and ^SET, which are not listed stocks.
+    sectors = {s: [(en, th)] for s, (th, en) in ticker_sector.items()}
+    with open(th_all_path, encoding="utf-8-sig") as f:
+        rows = list(csv.reader(f))[1:]
+    for row in rows:
+        th, en, tickers = row[0], row[1], [t for t in row[2:] if t]
+        for t in tickers:
+            if t in listing and (en, th) not in sectors.setdefault(t, []):
+                sectors[t].append((en, th))
+    return sectors
+#----------------------------------------------------------------------------------#
+
+
+class SymbolIndex:
+    """In-memory symbol -> sector -> monthly returns and GBM fit.
+
+    ``load()`` reads every universe ticker's monthly closes from the local
+    PriceStore (``refresh=False``: never a download on this path) and keeps
+    the fitted parameters, so a query over hundreds of tickers is a dict
+    lookup plus one batched simulation. Tickers without at least two stored
+    months are listed in ``missing``; ``python -m app.MS_Build`` fills the
+    store for the whole listing.
+    """
+
+    def __init__(self, store, year_window=15):
+        self.store = store
+        self.year_window = year_window
+        self.version = 0
+        self.loaded_at = None
+        self.load_seconds = None
+        self.missing = []
+        self._stats = {}
+        self._sectors = {}
+        self._lock = threading.Lock()
+        # one first load, however many threads ask for it at once
+        self._load_lock = threading.Lock()
+
+    def _load_one(self, symbol, meta, start, end):
+        monthly = self.store.close_monthly(symbol + ".BK", start, end, refresh=False)
+        if len(monthly) < 2:
+            return None
+        prices = monthly.to_numpy(dtype=float)
+        mu_y, sigma_y = fit_gbm(prices)
+        name, industry, (sector, sector_th) = meta
+        return SymbolStats(symbol, name, sector, sector_th, industry, np.diff(np.log(prices)),
+                           mu_y, sigma_y, float(prices[-1]), str(monthly.index[-1])[:10])
+
+    def load(self):
+        t0 = time.perf_counter()
+        today = datetime.today()
+        start = f"{today.year - self.year_window}-01-01"
+        end = today.strftime("%Y-%m-%d")
+
+        listing = load_listing()
+        sectors = load_sectors(listing)
+        stats, members, missing = {}, {}, []
+        # every listed stock is queryable; only mapped ones belong to a sector
+        for symbol in sorted(set(listing) | set(sectors)):
+            name, industry = listing.get(symbol, (symbol, None))
+            memberships = sectors.get(symbol, [])
+            for sector, sector_th in memberships:
+                members.setdefault(sector, {"sector_th": sector_th, "symbols": []})["symbols"].append(symbol)
+            main = memberships[0] if memberships else (None, None)
+            st = self._load_one(symbol, (name, industry, main), start, end)
+            if st is None:
+                missing.append(symbol)
+            else:
+                stats[symbol] = st
+
+        with self._lock:
+            self._stats = stats
+            self._sectors = members
+            self.missing = missing
+            self.loaded_at = time.time()
+            self.version += 1
+            self.load_seconds = time.perf_counter() - t0
+        return self.version
+
+    reload = load
+
+    def _ensure(self):
+        if self.loaded_at is None:
+            with self._load_lock:
+                if self.loaded_at is None:
+                    self.load()
+
+    def get(self, symbol):
+        self._ensure()
+        return self._stats.get(symbol.replace(".BK", "").upper())
+
+    def lookup(self, symbols):
+        # (stats found, symbols outside the universe, listed symbols without stored prices)
+        self._ensure()
+        found, not_found, no_data = [], [], []
+        for raw in dict.fromkeys(s.replace(".BK", "").upper() for s in symbols):
+            st = self._stats.get(raw)
+            if st is not None:
+                found.append(st)
+            elif raw in self.missing:
+                no_data.append(raw)
+            else:
+                not_found.append(raw)
+        return found, not_found, no_data
+
+    def sector(self, name):
+        # Members of a sector by English or Thai name (case-insensitive English).
+        self._ensure()
+        for sector, entry in self._sectors.items():
+            if name.lower() == sector.lower() or name == entry["sector_th"]:
+                return sector, entry["symbols"]
+        return None, []
+
+    def sectors(self):
+        self._ensure()
+        return {
+            sector: {
+                "sector_th": entry["sector_th"],
+                "symbols": entry["symbols"],
+                "available": [s for s in entry["symbols"] if s in self._stats],
+            }
+            for sector, entry in self._sectors.items()
+        }
+
+    def status(self):
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "symbols": len(self._stats),
+            "missing": self.missing,
+        }
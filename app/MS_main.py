@@ -1,14 +1,107 @@
-from fastapi import FastAPI
+import time
+_import_started = time.perf_counter()
+
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Header, HTTPException, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Annotated, List, Literal, Optional
+from concurrent.futures.process import BrokenProcessPool
 from app import MS_FC as ms
-import numpy as np
-import pandas as pd
-import math as ma
+from app.MS_Backtest import HORIZONS, MIN_HORIZON_YEARS, WINDOW_MONTHS, backtest_with_stats
+from app.MS_Cache import key_seed, request_key
+from app.MS_Fan import FAN_QUANTILES, MEDIA_TYPES, msgpack_available, to_binary, to_json, to_msgpack
+from app.MS_Metrics import Registry, StageTimer, n_sims_bucket
+from app.MS_Pool import PoolSaturated, PoolTimeout, SimulationPool
+import asyncio
+import logging
 import os
 
-app = FastAPI(title="Market Stock List API")
+ADMIN_TOKEN = os.environ.get("MS_ADMIN_TOKEN")
+# start every pool worker during warmup (set MS_POOL_WARM=0 to start them on demand)
+POOL_WARM = os.environ.get("MS_POOL_WARM", "1") != "0"
+# MS_TIMING_HEADERS=1 adds a Server-Timing header (per-stage ms) to listing responses
+TIMING_HEADERS = os.environ.get("MS_TIMING_HEADERS", "0") == "1"
+# most tickers one /market_stock/symbols request may ask for
+MAX_QUERY_SYMBOLS = int(os.environ.get("MS_MAX_QUERY_SYMBOLS", "500"))
+logger = logging.getLogger("uvicorn.error")
+
+metrics = Registry()
+# every index of a request is simulated in one batched pass, so the stages
+# are timed per request, not per index (ms_index_load_seconds is per index)
+stage_seconds = metrics.histogram(
+    "ms_forecast_stage_seconds", "Time spent per forecast stage (fetch, load, simulate, summarize).",
+    ("endpoint", "stage", "mode", "n_sims"),
+)
+request_seconds = metrics.histogram(
+    "ms_request_seconds", "End-to-end latency of the forecast endpoints (listing, symbols, sector, backtest).",
+    ("endpoint", "outcome"),
+)
+index_load_seconds = metrics.histogram(
+    "ms_index_load_seconds", "Time to read and fit one industry index, from the bundle or its CSV.",
+    ("index", "source"),
+)
+index_failures = metrics.counter(
+    "ms_forecast_index_failures", "Indexes left out of a forecast (no usable summary).", ("index",),
+)
+fetch_errors = metrics.counter(
+    "ms_price_fetch_errors", "Failed price downloads (stored prices were used instead).", ("symbol",),
+)
+pool_rejections = metrics.counter(
+    "ms_pool_rejections", "Simulations refused by the pool.", ("reason",),
+)
+
+
+def observe_index_load(version):
+    for name, seconds in ms.index_registry.load_seconds.items():
+        index_load_seconds.observe(seconds, index=name, source=ms.index_registry.source)
+
+
+ms.index_registry.on_reload(observe_index_load)
+
+# CPU-bound simulations run here, never on the event loop
+pool = SimulationPool.from_env()
+inflight = {}
+
+# cold-start timings (seconds), reported by /market_stock/ready
+startup = {
+    "import_s": round(time.perf_counter() - _import_started, 3),
+    "ready": False,
+}
+
+
+async def warmup():
+    # Heavy work happens here, after the server is already listening: the
+    # index data (and with it pandas), then the pool workers.
+    t0 = time.perf_counter()
+    try:
+        await asyncio.to_thread(ms.index_registry.load)
+        startup["index_load_s"] = round(time.perf_counter() - t0, 3)
+        await asyncio.to_thread(ms.symbol_index.load)
+        startup["symbol_index_load_s"] = round(ms.symbol_index.load_seconds, 3)
+        if POOL_WARM:
+            t1 = time.perf_counter()
+            await pool.warm(ms.warm_worker)
+            startup["pool_warm_s"] = round(time.perf_counter() - t1, 3)
+    except Exception as e:
+        startup["error"] = repr(e)
+        logger.exception("warmup failed")
+        return
+    startup["warmup_s"] = round(time.perf_counter() - t0, 3)
+    startup["ready_after_s"] = round(time.perf_counter() - _import_started, 3)
+    startup["ready"] = True
+    logger.info("market stock API ready: %s", startup)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    task = asyncio.create_task(warmup())
+    yield
+    task.cancel()
+    pool.shutdown()
+
+
+app = FastAPI(title="Market Stock List API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -19,13 +112,221 @@ app.add_middleware(
 )
 
 class user_data(BaseModel):
-    years_forecast : int = 10
-    n_sims : int = 50000
+    years_forecast : int = Field(10, le=ms.MAX_YEARS)
+    n_sims : int = Field(50000, ge=1, le=ms.MAX_SIMS)
+    mode : Literal["sampled", "exact", "adaptive"] = "sampled"
+    # adaptive mode: stop once the relative SE of every median and the SE of
+    # every prob_gain is at most this (n_sims is ignored)
+    target_se : float = Field(0.005, gt=0, le=0.5)
+    # normal sampler of the Monte Carlo modes, see app/MS_Sampling.py
+    sampling : Literal["plain", "antithetic", "moment_matching", "sobol"] = "plain"
+    # distribution of the monthly returns, see app/MS_Models.py (Monte Carlo
+    # modes only; exact is the closed-form gbm)
+    return_model : Literal["gbm", "student_t", "bootstrap"] = "gbm"
+
+
+class listing_data(user_data):
+    # monthly quantile bands of every index up to years_forecast (fan chart)
+    fan_chart : bool = False
+    fan_quantiles : List[float] = Field(list(FAN_QUANTILES), min_length=1, max_length=9)
+
+
+class symbol_data(user_data):
+    symbols : List[str] = Field(..., min_length=1, max_length=MAX_QUERY_SYMBOLS)
+
+
+class sector_data(user_data):
+    # English sector name (any case) or the Thai name
+    sector : str
+
+
+class backtest_data(BaseModel):
+    # estimation window (months) and forecast horizons (years), see app/MS_Backtest.py
+    window : int = Field(WINDOW_MONTHS, ge=12, le=180)
+    horizons : List[Annotated[float, Field(ge=MIN_HORIZON_YEARS, le=ms.MAX_YEARS)]] = Field(list(HORIZONS), min_length=1, max_length=10)
+    mode : Literal["exact", "sampled"] = "exact"
+    n_sims : int = Field(10000, ge=1, le=100000)
+    origins : bool = False
+
+
+async def run_simulation(fn, *args):
+    try:
+        return await pool.run(fn, *args)
+    except PoolSaturated:
+        pool_rejections.inc(reason="saturated")
+        raise HTTPException(status_code=429, detail="Too many simulations in progress, retry later.", headers={"Retry-After": "1"})
+    except PoolTimeout:
+        pool_rejections.inc(reason="timeout")
+        raise HTTPException(status_code=503, detail="Simulation timed out.")
+    except BrokenProcessPool:
+        pool_rejections.inc(reason="broken")
+        raise HTTPException(status_code=503, detail="Simulation worker crashed, retry later.")
+
+
+async def run_forecast(endpoint, req, fn, *args):
+    # One pool job; its stage timings and failures become metrics here, once,
+    # however many identical requests are waiting on it.
+    res, stats = await run_simulation(fn, *args)
+    sims = res.get("Precision", {}).get("sims_used", req.n_sims)
+    labels = {"endpoint": endpoint, "mode": req.mode, "n_sims": n_sims_bucket(sims)}
+    for stage, seconds in stats.get("stages", {}).items():
+        stage_seconds.observe(seconds, stage=stage, **labels)
+    for name in stats.get("failed", []):
+        index_failures.inc(index=name)
+    for symbol in stats.get("fetch_errors", []):
+        fetch_errors.inc(symbol=symbol)
+    return res, stats.get("stages", {})
+
+
+async def serve_forecast(endpoint, req, response, version, fn, make_args, extra=None):
+    # Cache lookup, in-flight dedupe and the pool run shared by the forecast
+    # endpoints; endpoint labels their metrics. make_args(key) builds fn's
+    # arguments only on a cache miss; extra is merged into the result before
+    # it is cached.
+    timer = StageTimer()
+    outcome = "error"
+    try:
+        with timer.stage("cache"):
+            key = request_key(req.model_dump(), version)
+            res = ms.forecast_cache.get(key)
+        if res is not None:
+            outcome = "hit"
+            return res
+
+        # identical requests already running share one simulation
+        task = inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(run_forecast(endpoint, req, fn, *make_args(key)))
+            inflight[key] = task
+            task.add_done_callback(lambda _: inflight.pop(key, None))
+        with timer.stage("wait"):
+            res, stages = await asyncio.shield(task)
+        timer.stages.update(stages)
+        outcome = "miss"
+
+        if "Error" not in res:
+            if extra:
+                res = {**res, **extra}
+            ms.forecast_cache.put(key, res)
+        return res
+    finally:
+        total = sum(timer.stages[s] for s in ("cache", "wait") if s in timer.stages)
+        request_seconds.observe(total, endpoint=endpoint, outcome=outcome)
+        if TIMING_HEADERS:
+            response.headers["Server-Timing"] = timer.server_timing() + f", total;dur={total * 1e3:.1f}"
+
+
+def symbol_args(req, entries):
+    return lambda key: (entries, req.years_forecast, req.n_sims, req.mode,
+                        key_seed(key), req.target_se, req.sampling, req.return_model)
+
+
+def encode(res, format, response):
+    # The cached result as JSON, or as the compact binary / msgpack encodings
+    # that carry the fan-chart bands as raw float32 (see app/MS_Fan.py).
+    if format == "json":
+        return to_json(res)
+    body = to_binary(res) if format == "binary" else to_msgpack(res)
+    return Response(body, media_type=MEDIA_TYPES[format], headers=dict(response.headers))
 
 
 @app.post("/market_stock/listing")
 
-def simulate(req : user_data):
-    res = ms.forecast_stock_prices(years_forecast=req.years_forecast, n_sims=req.n_sims)
+async def simulate(req : listing_data, response : Response,
+                   format : Literal["json", "binary", "msgpack"] = Query("json")):
+    if req.fan_chart and any(not 0 < q < 1 for q in req.fan_quantiles):
+        raise HTTPException(status_code=422, detail="fan_quantiles must be between 0 and 1.")
+    if format == "msgpack" and not msgpack_available():
+        raise HTTPException(status_code=406, detail="msgpack encoding needs the msgpack package.")
+    fan = sorted(set(req.fan_quantiles)) if req.fan_chart else None
+    # a due reload stats files and may parse CSVs: off the event loop
+    version = await asyncio.to_thread(ms.data_version)
+    res = await serve_forecast(
+        "listing", req, response, version, ms.forecast_with_stats,
+        lambda key: (req.years_forecast, req.n_sims, req.mode, key_seed(key),
+                     ms.index_registry.snapshot(), req.target_se, req.sampling, fan, req.return_model),
+    )
+    return encode(res, format, response)
+
+
+@app.post("/market_stock/symbols")
+
+async def simulate_symbols(req : symbol_data, response : Response):
+    # Answered from the in-memory symbol index: one batched simulation over
+    # every requested ticker, no price download. Before warmup has loaded the
+    # index, the lookup loads it, in a thread.
+    entries, not_found, no_data = await asyncio.to_thread(ms.symbol_index.lookup, req.symbols)
+    entries, short = ms.split_history(entries, req.return_model)
+    return await serve_forecast(
+        "symbols", req, response, ms.symbols_version(), ms.forecast_symbols_with_stats,
+        symbol_args(req, entries), {"not_found": not_found, "no_data": no_data + short},
+    )
+
+
+@app.post("/market_stock/sector")
+
+async def simulate_sector(req : sector_data, response : Response):
+    sector, members = await asyncio.to_thread(ms.symbol_index.sector, req.sector)
+    if sector is None:
+        raise HTTPException(status_code=404, detail=f"Unknown sector: {req.sector}")
+    entries, _, no_data = ms.symbol_index.lookup(members)
+    entries, short = ms.split_history(entries, req.return_model)
+    return await serve_forecast(
+        "sector", req, response, ms.symbols_version(), ms.forecast_symbols_with_stats,
+        symbol_args(req, entries), {"Sector": sector, "no_data": no_data + short},
+    )
+
+
+@app.post("/market_stock/backtest")
+
+async def run_backtest(req : backtest_data, response : Response):
+    version = await asyncio.to_thread(ms.data_version)
+    return await serve_forecast(
+        "backtest", req, response, version, backtest_with_stats,
+        lambda key: (ms.index_registry.snapshot(), req.window, req.horizons, req.mode, req.n_sims,
+                     key_seed(key), "plain", 1, req.origins),
+    )
+
+
+@app.get("/market_stock/sectors")
+
+def sectors():
+    return ms.symbol_index.sectors()
+
+
+@app.get("/market_stock/metrics")
+
+def metrics_endpoint():
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/market_stock/ready")
+
+def ready():
+    # 503 until warmup has finished; requests are still served meanwhile
+    if not startup["ready"]:
+        raise HTTPException(status_code=503, detail=startup)
+    return startup
+
+
+@app.get("/market_stock/cache")
+
+def cache_stats():
+    return ms.forecast_cache.stats()
+
+
+@app.get("/market_stock/pool")
+
+def pool_stats():
+    return pool.stats()
+
+
+@app.post("/market_stock/admin/reload")
+
+def reload_indexes(x_admin_token : Optional[str] = Header(None)):
+    if ADMIN_TOKEN and x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+    ms.index_registry.reload()
+    ms.symbol_index.reload()
 
-    return res
+    return {**ms.index_registry.status(), "symbols": ms.symbol_index.status()}
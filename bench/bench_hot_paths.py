@@ -0,0 +1,331 @@
+"""Benchmarks for the simulation engines and both API hot paths.
+
+    python bench/bench_hot_paths.py --out bench.json          # default sweep
+    python bench/bench_hot_paths.py --quick                   # small sweep
+    python bench/bench_hot_paths.py --compare old.json new.json
+
+The forecast service (``app`` package) and the portfolio service
+(``Port_Folio_Sim``, flat modules including its own ``app.py``) cannot share
+one import path, so each suite runs in its own subprocess and the results
+are merged. Every case reports wall time over ``--repeat`` runs, the peak RSS growth of
+this process while it runs, and the peak traced allocation (a separate
+tracemalloc run, so tracing never skews the timings). Network access is
+never used: ^SET.BK comes from a synthetic price series written to a
+temporary price store (``MS_PRICE_DIR``), which worker processes inherit.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import zlib
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+PORTFOLIO_DIR = os.path.join(ROOT, "Port_Folio_Sim")
+SUITES = ("forecast", "portfolio")
+
+PROFILE_BODY = {
+    "profile": {
+        "monthly_income": 50000,
+        "monthly_expense": 30000,
+        "monthly_contribution": 10000,
+        "current_savings": 200000,
+        "emergency_fund_amount": 60000,
+    },
+    "target_amount": 3000000,
+    "seed": 1,
+}
+# the "moderate" bucket with its domestic equity in SET_* indexes, so the
+# bootstrap model has industry history to resample
+SET_ALLOCATION = {"CASH": 0.10, "BONDS": 0.40, "SET_FINCIAL": 0.10, "SET_TECH": 0.10, "SET_SERVICE": 0.10,
+                  "INT_EQUITY": 0.15, "REITS": 0.05}
+
+
+#----------------------------------------------------------------------------------#
+def fake_fetcher(symbol, start, end):
+    # Deterministic synthetic daily OHLCV, stands in for yfinance.
+    idx = pd.bdate_range(start, pd.Timestamp(end) - pd.Timedelta(days=1))
+    rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+    close = 1000.0 * np.exp(np.cumsum(rng.normal(0.0002, 0.01, len(idx))))
+    return pd.DataFrame({"Open": close, "High": close, "Low": close, "Close": close,
+                         "Adj Close": close, "Volume": 1e6}, index=idx)
+
+
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+class RssSampler:
+    # Peak resident set size growth while the block runs (Linux /proc).
+
+    def __init__(self, interval=0.002):
+        self.interval = interval
+        self.peak = 0
+
+    @staticmethod
+    def rss():
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            return 0
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.rss())
+            time.sleep(self.interval)
+
+    def __enter__(self):
+        self.base = self.rss()
+        self.peak = self.base
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.rss())
+
+    @property
+    def growth_mb(self):
+        return (self.peak - self.base) / 2**20
+
+
+def measure(name, params, fn, repeat):
+    fn()  # warm-up: imports, caches, worker start-up
+    gc.collect()
+    times = []
+    with RssSampler() as rss:
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - t0)
+
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, alloc_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = {
+        "name": name,
+        "params": params,
+        "wall_s": {
+            "min": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.fmean(times),
+        },
+        "peak_rss_growth_mb": round(rss.growth_mb, 2),
+        "alloc_peak_mb": round(alloc_peak / 2**20, 2),
+    }
+    print(f"{name:<28} {json.dumps(params):<44} {result['wall_s']['median'] * 1e3:10.2f} ms"
+          f" {result['peak_rss_growth_mb']:8.1f} MB rss {result['alloc_peak_mb']:8.1f} MB alloc",
+          file=sys.stderr, flush=True)
+    return result
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+def serve(app_module):
+    # Drive an ASGI app (with its lifespan) from synchronous measure() calls.
+    import httpx
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    run = lambda coro: asyncio.run_coroutine_threadsafe(coro, loop).result()
+
+    ctx = app_module.lifespan(app_module.app)
+    run(ctx.__aenter__())
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app_module.app), base_url="http://bench")
+
+    def post(path, body):
+        async def go():
+            r = await client.post(path, json=body)
+            r.raise_for_status()
+        run(go())
+
+    def close():
+        run(client.aclose())
+        run(ctx.__aexit__(None, None, None))
+        loop.call_soon_threadsafe(loop.stop)
+
+    return post, close
+
+
+def cold_import(module, cwd):
+    # Fresh interpreter importing the API module: what an autoscaled instance pays.
+    subprocess.run([sys.executable, "-c", f"import {module}"], cwd=cwd, check=True)
+
+
+def forecast_suite(sims_grid, years_grid, repeat, api=True):
+    sys.path.insert(0, ROOT)
+    cold = [measure("cold import app.MS_main", {}, lambda: cold_import("app.MS_main", ROOT), repeat)]
+    from app.MS_Price import PriceStore
+    from app import MS_FC as ms
+
+    # synthetic ^SET.BK for today; pool workers read the same MS_PRICE_DIR
+    ms.price_store = PriceStore(root=os.environ["MS_PRICE_DIR"], fetcher=fake_fetcher)
+    ms.price_store.update("^SET.BK", f"{date.today().year - ms.year_window}-01-01", date.today())
+
+    out = cold
+    for years in years_grid:
+        for n in sims_grid:
+            out.append(measure("monte_carlo_gbm_monthly", {"n_sims": n, "years": years},
+                               lambda: ms.monte_carlo_gbm_monthly(1500.0, 0.05, 0.2, years, n_sims=n), repeat))
+            for mode in ("sampled", "exact"):
+                out.append(measure("forecast_stock_prices", {"n_sims": n, "years": years, "mode": mode},
+                                   lambda: ms.forecast_stock_prices(years, n_sims=n, mode=mode, seed=1), repeat))
+            # the other return models must stay within 1.5x of the gbm sampled path
+            for model in ("student_t", "bootstrap"):
+                out.append(measure("forecast_stock_prices",
+                                   {"n_sims": n, "years": years, "mode": "sampled", "return_model": model},
+                                   lambda: ms.forecast_stock_prices(years, n_sims=n, seed=1, return_model=model),
+                                   repeat))
+
+    if api:
+        from app import MS_main
+        post, close = serve(MS_main)
+
+        def listing(years, n):
+            ms.forecast_cache.invalidate()  # measure the miss path
+            post("/market_stock/listing", {"years_forecast": years, "n_sims": n})
+
+        for years in years_grid:
+            for n in sims_grid:
+                out.append(measure("api /market_stock/listing", {"n_sims": n, "years": years},
+                                   lambda: listing(years, n), repeat))
+        close()
+    return out
+
+
+def portfolio_suite(sims_grid, years_grid, repeat, api=True):
+    sys.path.insert(0, PORTFOLIO_DIR)
+    from simulation import run_monte_carlo, years_to_reach_real_target
+    from constants import ALLOCATION_RULES
+
+    out = []
+    for years in years_grid:
+        for n in sims_grid:
+            out.append(measure("run_monte_carlo", {"simulations": n, "years": years},
+                               lambda: run_monte_carlo(ALLOCATION_RULES["moderate"], 140000.0, 120000.0,
+                                                       years, n, seed=1), repeat))
+            for model in ("gbm", "student_t", "bootstrap"):
+                out.append(measure("run_monte_carlo", {"simulations": n, "years": years, "return_model": model,
+                                                       "allocation": "set"},
+                                   lambda: run_monte_carlo(SET_ALLOCATION, 140000.0, 120000.0,
+                                                           years, n, seed=1, return_model=model), repeat))
+        out.append(measure("years_to_reach_real_target", {"max_years": years},
+                           lambda: years_to_reach_real_target(140000.0, 120000.0, 0.05, 0.02, 1e12, years),
+                           repeat))
+
+    if api:
+        import app as portfolio_app
+        post, close = serve(portfolio_app)
+        out.append(measure("api /portfolio/analysis", {},
+                           lambda: post("/portfolio/analysis", PROFILE_BODY), repeat))
+        close()
+    return out
+
+
+def run_suite(suite, args, sims_grid, years_grid, repeat):
+    # Run one suite in a fresh interpreter and return its results.
+    cmd = [sys.executable, os.path.abspath(__file__), "--suite", suite, "--repeat", str(repeat),
+           "--sims", *map(str, sims_grid), "--years", *map(str, years_grid)]
+    if args.no_api:
+        cmd.append("--no-api")
+    proc = subprocess.run(cmd, cwd=ROOT, stdout=subprocess.PIPE, text=True, check=True)
+    return json.loads(proc.stdout.splitlines()[-1])
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+def git_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    key = lambda r: (r["name"], json.dumps(r["params"], sort_keys=True))
+    before = {key(r): r for r in old["results"]}
+    print(f"{old['meta'].get('commit')} -> {new['meta'].get('commit')}")
+    for r in new["results"]:
+        b = before.get(key(r))
+        if b is None:
+            continue
+        t0, t1 = b["wall_s"]["median"], r["wall_s"]["median"]
+        print(f"{r['name']:<28} {json.dumps(r['params']):<44} {t0 * 1e3:10.2f} -> {t1 * 1e3:10.2f} ms"
+              f"  x{t0 / t1 if t1 else float('inf'):6.2f}"
+              f"   alloc {b['alloc_peak_mb']:.1f} -> {r['alloc_peak_mb']:.1f} MB")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", help="write JSON results here (default: stdout)")
+    parser.add_argument("--quick", action="store_true", help="small sweep for a smoke run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--sims", type=int, nargs="+", help="n_sims sweep")
+    parser.add_argument("--years", type=int, nargs="+", help="years sweep")
+    parser.add_argument("--no-api", action="store_true", help="skip the endpoint cases")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="diff two result files")
+    parser.add_argument("--suite", choices=SUITES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    sims_grid = args.sims or ([1000, 5000] if args.quick else [1000, 10000, 50000])
+    years_grid = args.years or ([5] if args.quick else [5, 20, 50])
+    repeat = 2 if args.quick else args.repeat
+
+    if args.suite:
+        suite = forecast_suite if args.suite == "forecast" else portfolio_suite
+        results = suite(sims_grid, years_grid, repeat, api=not args.no_api)
+        # progress lines go to stderr, the last stdout line is the payload
+        print(json.dumps(results))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory() as price_dir:
+        os.environ["MS_PRICE_DIR"] = price_dir
+        for suite in SUITES:
+            results += run_suite(suite, args, sims_grid, years_grid, repeat)
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Estimator variance of each sampler against the plain sampler.
+
+    python bench/bench_variance.py                        # default: 200 seeds
+    python bench/bench_variance.py --reps 50 --sims 5000 --out variance.json
+
+Every case reruns one engine with ``--reps`` different seeds and reports, per
+estimator, the variance across seeds and ``plain variance / variance``: how
+many times more plain paths would give the same spread, the "effective
+sample multiplier". Forecast estimators are the terminal median, mean and
+prob_gain of each industry index (averaged over indexes); portfolio ones are
+the final-year p10 / p50 / p90 of ``run_monte_carlo``. As in
+``bench_hot_paths.py`` each engine runs in its own subprocess.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+PORTFOLIO_DIR = os.path.join(ROOT, "Port_Folio_Sim")
+SUITES = ("forecast", "portfolio")
+METHODS = ("plain", "antithetic", "moment_matching", "sobol")
+
+
+#----------------------------------------------------------------------------------#
+def replicate(run, reps):
+    # run(seed) -> {estimator: array}; returns ({estimator: (reps, ...)}, seconds per run)
+    samples = {}
+    t0 = time.perf_counter()
+    for seed in range(reps):
+        for name, value in run(seed).items():
+            samples.setdefault(name, []).append(np.asarray(value, dtype=float))
+    seconds = (time.perf_counter() - t0) / reps
+    return {name: np.stack(v) for name, v in samples.items()}, seconds
+
+
+def compare_methods(run_for, reps):
+    # Variance per estimator and method, with the ratio against plain.
+    out = {}
+    variances = {}
+    for method in METHODS:
+        samples, seconds = replicate(run_for(method), reps)
+        variances[method] = {name: v.var(axis=0, ddof=1) for name, v in samples.items()}
+        out[method] = {"seconds_per_run": round(seconds, 5), "estimators": {}}
+    for method in METHODS:
+        for name, var in variances[method].items():
+            plain = variances["plain"][name]
+            # a variance at rounding level (antithetic median) counts as exact
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ratio = np.where(var > 1e-12 * plain, plain / var, np.inf)
+            out[method]["estimators"][name] = {
+                "variance": float(var.mean()),
+                "vs_plain": float(np.mean(ratio[np.isfinite(ratio)])) if np.isfinite(ratio).any() else None,
+            }
+    return out
+#----------------------------------------------------------------------------------#
+
+#----------------------------------------------------------------------------------#
+def forecast_suite(sims, years, reps):
+    sys.path.insert(0, ROOT)
+    from app import MS_FC as ms
+
+    indexes = ms.index_registry.snapshot()
+    S0 = [indexes[i].S0 for i in ms.all_ind]
+    mu = [indexes[i].mu_y for i in ms.all_ind]
+    sigma = [indexes[i].sigma_y for i in ms.all_ind]
+
+    def run_for(method):
+        def run(seed):
+            median, mean, prob_gain = ms.simulate_terminal_batch(
+                S0, mu, sigma, years, n_sims=sims, rng=np.random.default_rng(seed), sampling=method)
+            # relative spread, so indexes at different price levels average fairly
+            return {"median": median / np.asarray(S0), "mean": mean / np.asarray(S0), "prob_gain": prob_gain}
+        return run
+
+    return {"engine": "simulate_terminal_batch", "n_sims": sims, "years": years, "reps": reps,
+            "methods": compare_methods(run_for, reps)}
+
+
+def portfolio_suite(sims, years, reps):
+    sys.path.insert(0, PORTFOLIO_DIR)
+    from constants import ALLOCATION_RULES
+    from simulation import run_monte_carlo
+
+    def run_for(method):
+        def run(seed):
+            last = run_monte_carlo(ALLOCATION_RULES["moderate"], 140000.0, 120000.0, years, sims,
+                                   seed=seed, sampling=method)["portfolio_percentiles"][-1]
+            return {k: last[k] / 1e6 for k in ("p10", "p50", "p90")}
+        return run
+
+    return {"engine": "run_monte_carlo", "n_sims": sims, "years": years, "reps": reps,
+            "methods": compare_methods(run_for, reps)}
+#----------------------------------------------------------------------------------#
+
+
+def print_report(result):
+    print(f"\n{result['engine']}  n_sims={result['n_sims']} years={result['years']} reps={result['reps']}",
+          file=sys.stderr)
+    for method, r in result["methods"].items():
+        cells = "  ".join(
+            f"{name} x{e['vs_plain']:.2f}" if e["vs_plain"] is not None else f"{name} exact"
+            for name, e in r["estimators"].items()
+        )
+        print(f"  {method:<16} {r['seconds_per_run'] * 1e3:9.2f} ms/run   {cells}", file=sys.stderr)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reps", type=int, default=200, help="seeds per method")
+    parser.add_argument("--sims", type=int, default=10000)
+    parser.add_argument("--years", type=int, default=10)
+    parser.add_argument("--out", help="write JSON results here (default: stdout)")
+    parser.add_argument("--suite", choices=SUITES, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.suite:
+        suite = forecast_suite if args.suite == "forecast" else portfolio_suite
+        print(json.dumps(suite(args.sims, args.years, args.reps)))
+        return
+
+    results = []
+    for suite in SUITES:
+        cmd = [sys.executable, os.path.abspath(__file__), "--suite", suite,
+               "--reps", str(args.reps), "--sims", str(args.sims), "--years", str(args.years)]
+        proc = subprocess.run(cmd, cwd=ROOT, stdout=subprocess.PIPE, text=True, check=True)
+        results.append(json.loads(proc.stdout.splitlines()[-1]))
+        print_report(results[-1])
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()